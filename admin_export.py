@@ -0,0 +1,205 @@
+# admin_export.py
+"""
+Streaming data exports for admins.
+
+Rows are read with `yield_per` (server-side cursor where the driver
+supports it), serialized into ~64 KB text chunks and optionally gzipped
+on the fly, so memory stays flat no matter how many rows are exported.
+With sharding on, per-user tables are read one shard after another.
+
+Formats:
+  csv       – header row + one line per record
+  jsonl     – one JSON object per line
+  columnar  – JSON lines of column-major batches: a header line with the
+              column names, then {"n": rows, "data": [[col0...], [col1...]]}
+              per batch of BATCH_ROWS records (compact once gzipped)
+"""
+
+import csv
+import io
+import json
+
+from compression import GzipStream
+from database import SessionLocal, group_by_shard, shard_session, shard_sessions
+from models import Plan, Progress, User, UserProfile
+
+FETCH_ROWS = 1000
+BATCH_ROWS = 5000
+CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "columnar": "application/x-ndjson",
+}
+
+_USER_COLUMNS = [
+    ("user_id", User.id),
+    ("name", User.name),
+    ("email", User.email),
+]
+
+_PROFILE_COLUMNS = [
+    ("age", UserProfile.age),
+    ("gender", UserProfile.gender),
+    ("height_cm", UserProfile.height_cm),
+    ("weight_kg", UserProfile.weight_kg),
+    ("activity_level", UserProfile.activity_level),
+    ("goal", UserProfile.goal),
+    ("experience_level", UserProfile.experience_level),
+]
+
+_PLAN_COLUMNS = [
+    ("plan_id", Plan.id),
+    ("user_id", Plan.user_id),
+    ("bmi", Plan.bmi),
+    ("bmr", Plan.bmr),
+    ("calories_target", Plan.calories_target),
+    ("diet_plan", Plan.diet_plan),
+    ("workout_plan", Plan.workout_plan),
+]
+
+_PROGRESS_COLUMNS = [
+    ("user_id", Progress.user_id),
+    ("day", Progress.day),
+    ("weight_kg", Progress.weight_kg),
+]
+
+
+def _stream(query):
+    return query.execution_options(stream_results=True).yield_per(FETCH_ROWS)
+
+
+def _with_profiles(users):
+    """Attach profile columns to a batch of user rows (profiles may live on shards)."""
+    profiles = {}
+    for shard, ids in group_by_shard([u[0] for u in users]).items():
+        sdb = shard_session(shard)
+        try:
+            query = sdb.query(UserProfile.user_id, *[c for _, c in _PROFILE_COLUMNS]).filter(
+                UserProfile.user_id.in_(ids)
+            )
+            for user_id, *values in query:
+                profiles[user_id] = tuple(values)
+        finally:
+            sdb.close()
+
+    empty = (None,) * len(_PROFILE_COLUMNS)
+    for user in users:
+        yield tuple(user) + profiles.get(user[0], empty)
+
+
+def _user_rows():
+    # users come from the directory, profiles are looked up per batch
+    db = SessionLocal()
+    try:
+        batch = []
+        for row in _stream(db.query(*[c for _, c in _USER_COLUMNS]).order_by(User.id)):
+            batch.append(row)
+            if len(batch) == FETCH_ROWS:
+                yield from _with_profiles(batch)
+                batch = []
+        if batch:
+            yield from _with_profiles(batch)
+    finally:
+        db.close()
+
+
+def _shard_rows(columns, order_by):
+    # one shard after another (a single pass when sharding is off)
+    for sdb in shard_sessions():
+        try:
+            for row in _stream(sdb.query(*[c for _, c in columns]).order_by(*order_by)):
+                yield tuple(row)
+        finally:
+            sdb.close()
+
+
+EXPORT_DATASETS = {
+    "users": (_USER_COLUMNS + _PROFILE_COLUMNS, _user_rows),
+    "plans": (_PLAN_COLUMNS, lambda: _shard_rows(_PLAN_COLUMNS, (Plan.id,))),
+    "progress": (
+        _PROGRESS_COLUMNS,
+        lambda: _shard_rows(_PROGRESS_COLUMNS, (Progress.user_id, Progress.day)),
+    ),
+}
+
+
+def export_columns(dataset):
+    return [name for name, _ in EXPORT_DATASETS[dataset][0]]
+
+
+def iter_rows(dataset):
+    """Yield plain tuples for a dataset, streamed from the database."""
+    _, rows_fn = EXPORT_DATASETS[dataset]
+    return rows_fn()
+
+
+def _csv_lines(dataset, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(export_columns(dataset))
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _jsonl_lines(dataset, rows):
+    columns = export_columns(dataset)
+    parts, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts)
+            parts, size = [], 0
+    yield "".join(parts)
+
+
+def _columnar_lines(dataset, rows):
+    columns = export_columns(dataset)
+    yield json.dumps({"format": "fitai-columnar", "version": 1, "dataset": dataset, "columns": columns}) + "\n"
+
+    data = [[] for _ in columns]
+    n = 0
+    for row in rows:
+        for col, value in zip(data, row):
+            col.append(value)
+        n += 1
+        if n == BATCH_ROWS:
+            yield json.dumps({"n": n, "data": data}, ensure_ascii=False) + "\n"
+            data = [[] for _ in columns]
+            n = 0
+    if n:
+        yield json.dumps({"n": n, "data": data}, ensure_ascii=False) + "\n"
+
+
+_WRITERS = {"csv": _csv_lines, "jsonl": _jsonl_lines, "columnar": _columnar_lines}
+
+
+def iter_export(dataset, fmt):
+    """Text chunks of the full export, produced lazily."""
+    for chunk in _WRITERS[fmt](dataset, iter_rows(dataset)):
+        if chunk:
+            yield chunk
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip a stream of text chunks on the fly, yielding compressed bytes."""
+    compressor = GzipStream(level)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def export_filename(dataset, fmt, compressed):
+    ext = "jsonl" if fmt in ("jsonl", "columnar") else fmt
+    name = f"fitai_{dataset}{'_columnar' if fmt == 'columnar' else ''}.{ext}"
+    return name + ".gz" if compressed else name
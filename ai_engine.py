@@ -14,6 +14,13 @@ Output: dict with:
   workout_plan (dict)
 """
 
+import threading
+from functools import lru_cache
+
+from exercise_library import exercise_library
+from meal_planner import build_meal_plan
+
+
 def _calc_bmi(weight, height_cm):
     h_m = height_cm / 100.0
     if h_m <= 0:
@@ -40,6 +47,11 @@ def _activity_factor(level):
     }.get(level, 1.4)
 
 
+def maintenance_calories(bmr, activity_level):
+    """Calories per day that keep weight stable (TDEE)."""
+    return int(round(bmr * _activity_factor(activity_level)))
+
+
 def _adjust_for_goal(calories, goal):
     goal = (goal or "").lower()
     if goal == "lose":
@@ -60,62 +72,87 @@ def _build_diet_plan(profile, calories_target):
     else:
         focus = "Balanced meals to maintain weight and energy."
 
-    if diet_type == "veg":
-        breakfast = "Oats with milk + nuts + fruit"
-        lunch = "Brown rice / roti with dal, veg sabzi and salad"
-        dinner = "Paneer / tofu curry with roti and mixed salad"
-        snacks = "Fruits, roasted chana, curd or buttermilk"
-    elif diet_type == "nonveg":
-        breakfast = "Eggs + whole‑wheat toast + fruit"
-        lunch = "Rice / roti with chicken curry and salad"
-        dinner = "Grilled fish / chicken with veggies"
-        snacks = "Boiled eggs, yogurt, nuts"
-    else:  # mixed
-        breakfast = "Oats or eggs with fruit"
-        lunch = "Rice / roti with dal or chicken and salad"
-        dinner = "Paneer / egg / chicken with veggies"
-        snacks = "Fruits, nuts, yogurt"
+    meals = build_meal_plan(
+        diet_type, goal, calories_target, profile.get("weight_kg") or 70
+    )
 
     return {
         "focus": focus,
         "diet_type": diet_type,
         "calories_target": calories_target,
-        "breakfast": breakfast,
-        "lunch": lunch,
-        "dinner": dinner,
-        "snacks": snacks,
+        "breakfast": meals["breakfast"],
+        "lunch": meals["lunch"],
+        "dinner": meals["dinner"],
+        "snacks": meals["snacks"],
+        "protein_target_g": meals["protein_target_g"],
+        "fibre_target_g": meals["fibre_target_g"],
+        "totals": meals["totals"],
     }
 
 
-def _sets_reps_for_level(level):
+def _sets_reps_for_level(level, modality="strength"):
     level = (level or "beginner").lower()
     if level == "advanced":
+        if modality == "calisthenics":
+            return "4–5 sets × 6–10 reps (harder variations)"
         return "4–5 sets × 6–10 reps (heavier weight)"
     if level == "intermediate":
         return "3–4 sets × 8–12 reps"
     return "2–3 sets × 10–15 reps"
 
 
-def _build_strength_split(level_desc):
-    sr = level_desc
-    return [
-        f"Chest + Triceps – presses, push‑ups, dips ({sr})",
-        f"Back + Biceps – rows, pulldowns, curls ({sr})",
-        f"Legs – squats, lunges, hip hinge work ({sr})",
-        f"Shoulders – overhead press, lateral raises ({sr})",
-        f"Full‑body / weak‑point focus – mix of compounds and isolation ({sr})",
-    ]
-
-
-def _build_calisthenics_split(level_desc):
-    sr = level_desc
-    return [
-        f"Push day – push‑ups, dips, pike push‑ups ({sr})",
-        f"Pull day – inverted rows, bodyweight rows ({sr})",
-        f"Legs + core – squats, lunges, planks ({sr})",
-        f"Upper body skills – harder push / pull progressions ({sr})",
-        f"Full‑body circuit – 6–8 exercises done in a circuit ({sr})",
-    ]
+# (label, muscle groups, modality) per training day; exercises come
+# from the exercise library so the splits follow the data file
+_STRENGTH_DAYS = [
+    ("Chest + Triceps", ("chest", "triceps"), "strength"),
+    ("Back + Biceps", ("back", "biceps"), "strength"),
+    ("Legs", ("quads", "hamstrings", "glutes"), "strength"),
+    ("Shoulders", ("shoulders",), "strength"),
+    ("Full‑body / weak‑point focus", ("full_body", "core", "quads", "back"), "strength"),
+]
+
+_CALISTHENICS_DAYS = [
+    ("Push day", ("chest", "triceps", "shoulders"), "calisthenics"),
+    ("Pull day", ("back", "biceps"), "calisthenics"),
+    ("Legs + core", ("quads", "glutes", "core"), "calisthenics"),
+    ("Upper body skills", ("shoulders", "back", "chest"), "calisthenics"),
+    ("Full‑body circuit", ("full_body", "quads", "core"), "calisthenics"),
+]
+
+_GENERIC_DAYS = [
+    ("Full body A", ("quads", "chest", "back"), "strength"),
+    ("Full body B", ("hamstrings", "chest", "back"), "strength"),
+    ("Lower focus", ("quads", "hamstrings", "calves"), "strength"),
+    ("Upper focus", ("chest", "back", "shoulders", "biceps"), "strength"),
+    ("Conditioning", ("full_body", "core"), "calisthenics"),
+]
+
+_MOBILITY_DAYS = [
+    ("Full‑body mobility", ("hips", "shoulders", "spine")),
+    ("Lower‑body stretching + ankle mobility", ("hips", "hamstrings", "ankles")),
+    ("Upper‑body stretching + band work", ("shoulders", "spine")),
+    ("Yoga‑style flow (20–30 min)", ("full_body", "spine")),
+    ("Mixed light mobility and core stability", ("core", "hips")),
+]
+
+
+def _compose_split(days, level, level_descs):
+    """level_descs: sets/reps text per modality (bodyweight days progress differently)."""
+    library = exercise_library()
+    used = set()
+    split = []
+    for label, muscles, modality in days:
+        names = library.pick(muscles, modality, level, count=3, used=used)
+        split.append(f"{label} – {', '.join(names)} ({level_descs[modality]})")
+    return split
+
+
+def _build_strength_split(level, level_descs):
+    return _compose_split(_STRENGTH_DAYS, level, level_descs)
+
+
+def _build_calisthenics_split(level, level_descs):
+    return _compose_split(_CALISTHENICS_DAYS, level, level_descs)
 
 
 def _build_cardio_split(level):
@@ -126,66 +163,230 @@ def _build_cardio_split(level):
     else:
         base = "20–30 min brisk walk or easy cycling"
 
+    library = exercise_library()
+    used = set()
+
+    def options(muscles, equipment=None):
+        names = library.pick(muscles, "cardio", level, count=2, equipment=equipment, used=used)
+        return " / ".join(names)
+
     return [
-        f"Low‑intensity cardio – {base}",
-        f"Interval cardio – short bursts + easy recovery",
-        "Mixed cardio (bike / walk / jog) – easy to moderate",
-        "Uphill or stair cardio – controlled pace",
+        f"Low‑intensity cardio ({options(('legs',))}) – {base}",
+        f"Interval cardio ({options(('cardiovascular',))}) – short bursts + easy recovery",
+        f"Mixed cardio ({options(('full_body',))}) – easy to moderate",
+        f"Uphill or stair cardio ({options(('legs',), ('stairs', 'treadmill', 'none'))}) – controlled pace",
         "Favourite cardio modality – repeat best session of the week",
     ]
 
 
-def _build_generic_split(level_desc):
-    sr = level_desc
-    return [
-        f"Full body A – squat / push / pull ({sr})",
-        f"Full body B – hinge / horizontal push / row ({sr})",
-        f"Lower focus – quads + hamstrings + calves ({sr})",
-        f"Upper focus – chest, back, shoulders, arms ({sr})",
-        f"Conditioning – lighter full‑body circuit ({sr})",
-    ]
+def _build_mobility_split(level):
+    library = exercise_library()
+    used = set()
+    split = []
+    for label, muscles in _MOBILITY_DAYS:
+        names = library.pick(muscles, "mobility", level, count=3, used=used)
+        split.append(f"{label} – {', '.join(names)}")
+    return split
 
 
-def _build_workout_plan(profile):
-    focus = (profile.get("workout_focus") or "general").lower()
-    level = (profile.get("experience_level") or "beginner").lower()
+def _build_generic_split(level, level_descs):
+    return _compose_split(_GENERIC_DAYS, level, level_descs)
+
+
+# ---------------------------------------------------------
+# Periodized multi-week program
+# ---------------------------------------------------------
+PROGRAM_WEEKS = 52
 
-    level_desc = _sets_reps_for_level(level)
+_DAY6 = "Active recovery – light walk, stretching, very easy mobility (15–30 min)."
+_DAY7 = "Full rest – no hard training. Focus on sleep, hydration and good food."
 
+_SPLIT_LABELS = {
+    "strength": "Strength / Functional Split",
+    "calisthenics": "Calisthenics Split",
+    "cardio": "Cardio / Endurance Plan",
+    "mobility": "Mobility & Flexibility Plan",
+    "general": "General Fitness Plan",
+}
+
+def _focus_category(focus):
     if focus in ("strength", "power", "functional"):
-        days_1_to_5 = _build_strength_split(level_desc)
-        base_label = "Strength / Functional Split"
-    elif focus in ("calisthenics",):
-        days_1_to_5 = _build_calisthenics_split(level_desc)
-        base_label = "Calisthenics Split"
-    elif focus in ("cardio", "endurance"):
-        days_1_to_5 = _build_cardio_split(level)
-        base_label = "Cardio / Endurance Plan"
-    elif focus in ("mobility",):
-        days_1_to_5 = [
-            "Full‑body mobility: hips, shoulders, thoracic spine",
-            "Lower‑body stretching + ankle mobility",
-            "Upper‑body stretching + band work",
-            "Yoga‑style flow (20–30 min)",
-            "Mixed light mobility and core stability",
-        ]
-        base_label = "Mobility & Flexibility Plan"
+        return "strength"
+    if focus in ("calisthenics",):
+        return "calisthenics"
+    if focus in ("cardio", "endurance"):
+        return "cardio"
+    if focus in ("mobility",):
+        return "mobility"
+    return "general"
+
+
+def _block_length(level):
+    # weeks per block including the closing deload week;
+    # harder trainees accumulate fatigue faster, so they deload more often
+    return {"advanced": 4, "intermediate": 5}.get(level, 6)
+
+
+def _week_position(level, week_no):
+    block_len = _block_length(level)
+    block = (week_no - 1) // block_len + 1
+    week_in_block = (week_no - 1) % block_len + 1
+    return block, week_in_block, week_in_block == block_len
+
+
+def _overload_desc(level, week_in_block, deload, modality="strength"):
+    base = _sets_reps_for_level(level, modality)
+    if deload:
+        return f"{base} – deload: half the sets at ~60% effort"
+    if week_in_block == 1:
+        return base
+
+    parts = [base]
+    extra_sets = (week_in_block - 1) // 2
+    if extra_sets:
+        parts.append(f"+{extra_sets} {'set' if extra_sets == 1 else 'sets'}")
+    if modality == "calisthenics":
+        # no load to add to bodyweight moves: more reps, then a harder variation
+        extra_reps = week_in_block - 1
+        parts.append(f"+{extra_reps} {'rep' if extra_reps == 1 else 'reps'} per set or a harder variation")
+    else:
+        parts.append(f"+{2.5 * (week_in_block - 1):g}% load")
+    return ", ".join(parts)
+
+
+def _week_days(category, level, week_in_block, deload):
+    if category in ("strength", "calisthenics", "general"):
+        descs = {
+            modality: _overload_desc(level, week_in_block, deload, modality)
+            for modality in ("strength", "calisthenics")
+        }
+        builder = {
+            "strength": _build_strength_split,
+            "calisthenics": _build_calisthenics_split,
+            "general": _build_generic_split,
+        }[category]
+        return builder(level, descs)
+
+    if category == "cardio":
+        days = _build_cardio_split(level)
+        if deload:
+            return [f"{d} (deload: ~60% of usual duration, easy pace)" for d in days]
+        if week_in_block > 1:
+            return [f"{d} (+{10 * (week_in_block - 1)}% duration)" for d in days]
+        return days
+
+    # mobility
+    days = _build_mobility_split(level)
+    if deload:
+        return [f"{d} (deload: gentle range, short holds)" for d in days]
+    hold = 30 + 10 * (week_in_block - 1)
+    return [f"{d} (hold stretches ~{hold}s)" for d in days]
+
+
+def _program_week(category, level, week_no):
+    block, week_in_block, deload = _week_position(level, week_no)
+    block_len = _block_length(level)
+    if deload:
+        note = f"Block {block} · Deload week – reduce volume and recover."
+    elif week_in_block == 1 and block == 1:
+        note = f"Block 1 · Week 1 of {block_len} – baseline week, log your working weights."
+    elif week_in_block == 1:
+        note = (
+            f"Block {block} · Week 1 of {block_len} – "
+            f"start slightly heavier than the opening week of block {block - 1}."
+        )
     else:
-        days_1_to_5 = _build_generic_split(level_desc)
-        base_label = "General Fitness Plan"
+        note = (
+            f"Block {block} · Week {week_in_block} of {block_len} – "
+            "progressive overload, keep 1–2 reps in reserve."
+        )
 
-    # Always include Day 6 + Day 7
-    day6 = "Active recovery – light walk, stretching, very easy mobility (15–30 min)."
-    day7 = "Full rest – no hard training. Focus on sleep, hydration and good food."
+    return {
+        "week": week_no,
+        "block": block,
+        "phase": "deload" if deload else "build",
+        "note": note,
+        "workouts": _week_days(category, level, week_in_block, deload) + [_DAY6, _DAY7],
+    }
+
+
+def iter_program_weeks(focus, level, weeks=PROGRAM_WEEKS):
+    """Yield one dict per training week, built only when the caller asks for it."""
+    category = _focus_category(focus)
+    for week_no in range(1, weeks + 1):
+        yield _program_week(category, level, week_no)
+
+
+class PeriodizedProgram:
+    """
+    A long program whose weeks are materialized on first access and then
+    kept. Past the last planned week the blocks simply carry on; those
+    weeks are built on request and not kept.
+    """
+
+    def __init__(self, focus, level, weeks=PROGRAM_WEEKS):
+        self.total_weeks = weeks
+        self._category = _focus_category(focus)
+        self._level = level
+        self._source = iter_program_weeks(focus, level, weeks)
+        self._weeks = []
+        self._lock = threading.Lock()
+
+    def week(self, week_no):
+        week_no = max(1, int(week_no))
+        if week_no > self.total_weeks:
+            return _program_week(self._category, self._level, week_no)
+        with self._lock:
+            while len(self._weeks) < week_no:
+                self._weeks.append(next(self._source))
+            return self._weeks[week_no - 1]
+
+    @property
+    def materialized_weeks(self):
+        return len(self._weeks)
+
+
+@lru_cache(maxsize=64)
+def _program_for(category, level, weeks):
+    return PeriodizedProgram(category, level, weeks)
+
+
+def get_program(focus, level, weeks=PROGRAM_WEEKS):
+    """Shared program for a focus / level pair (same inputs → same weeks)."""
+    focus = (focus or "general").lower()
+    level = (level or "beginner").lower()
+    return _program_for(_focus_category(focus), level, weeks)
+
+
+def get_program_week(workout_plan, week_no):
+    """
+    Week `week_no` of the program behind a stored workout_plan dict.
+    Returns None for custom plans and for plans saved before periodization.
+    """
+    if not workout_plan or workout_plan.get("focus") == "custom":
+        return None
+    level = workout_plan.get("experience_level")
+    if not level:
+        return None
+    weeks = workout_plan.get("program_weeks", PROGRAM_WEEKS)
+    return get_program(workout_plan.get("focus"), level, weeks).week(week_no)
+
+
+def _build_workout_plan(profile):
+    focus = (profile.get("workout_focus") or "general").lower()
+    level = (profile.get("experience_level") or "beginner").lower()
 
-    workouts = days_1_to_5 + [day6, day7]
+    base_label = _SPLIT_LABELS[_focus_category(focus)]
+    first_week = get_program(focus, level).week(1)
 
     level_name = level.capitalize()
     return {
         "level": f"{level_name} • {base_label}",
         "focus": focus,
+        "experience_level": level,
+        "program_weeks": PROGRAM_WEEKS,
         "activity_base": profile.get("activity_level", ""),
-        "workouts": workouts,
+        "workouts": first_week["workouts"],
     }
 
 
@@ -8,25 +8,59 @@ from flask import (
     flash,
     session,
     send_file,
+    send_from_directory,
     jsonify,
+    Response,
+    stream_with_context,
 )
 from flask_bcrypt import Bcrypt
 from sqlalchemy.exc import IntegrityError
-from database import SessionLocal
-from models import User, UserProfile, Plan, Progress, init_db
-from ai_engine import build_complete_plan
+from database import SessionLocal, user_session
+from compression import CompressionMiddleware
+from models import User, UserProfile, Plan, Progress, ProgressStats, init_db
+from ai_engine import build_complete_plan, get_program_week
+from exercise_library import exercise_library
+from admin_export import (
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    export_filename,
+    gzip_stream,
+    iter_export,
+)
+from batch_pdfs import iter_plan_zip, latest_plan_rows, parse_user_ids
+from chat_history import append_message, history_page, recent_turns
+from cohort_rollups import (
+    bmi_band,
+    cohort_snapshot,
+    on_plan_generated,
+    on_profile_saved,
+    on_user_registered,
+    on_weekly_rate_changed,
+    profile_buckets,
+    reconcile,
+)
+from plan_pdf import plan_pdf
+from shard_tool import rebalance
+from progress_analytics import (
+    record_progress,
+    clear_progress_stats,
+    get_progress_stats,
+    progress_summary,
+)
 from functools import wraps
+import click
 from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import mm
 import ast
+import math
+import re
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"  # change in real app
 bcrypt = Bcrypt(app)
 
+# gzip / brotli for HTML, JSON and other text responses
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, level=6, min_size=500)
+
 # Initialize DB
 init_db()
 
@@ -74,6 +108,20 @@ def home():
     return render_template("index.html")
 
 
+@app.route("/sw.js")
+def service_worker():
+    # served from the root so the worker's scope covers every page
+    response = send_from_directory(app.static_folder, "js/sw.js", mimetype="text/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/offline")
+def offline():
+    """App shell the service worker shows when a page can't be fetched."""
+    return render_template("offline.html")
+
+
 @app.route("/register", methods=["GET", "POST"])
 def register():
     db = SessionLocal()
@@ -87,11 +135,17 @@ def register():
         db.add(new_user)
         try:
             db.commit()
-            flash("Registration successful. Please login.", "success")
-            return redirect(url_for("login"))
         except IntegrityError:
             db.rollback()
             flash("Email already exists.", "danger")
+        else:
+            # counters live with the user's data, after the directory commit
+            udb = user_session(new_user.id)
+            on_user_registered(udb)
+            udb.commit()
+            udb.close()
+            flash("Registration successful. Please login.", "success")
+            return redirect(url_for("login"))
         finally:
             db.close()
     return render_template("register.html")
@@ -129,7 +183,7 @@ def profile():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     profile = db.query(UserProfile).filter_by(user_id=user.id).first()
 
     if request.method == "POST":
@@ -141,6 +195,7 @@ def profile():
         goal = request.form["goal"]
         experience_level = request.form.get("experience_level", "beginner")
 
+        old_buckets = profile_buckets(profile)
         if profile:
             profile.age = age
             profile.gender = gender
@@ -162,6 +217,14 @@ def profile():
             )
             db.add(profile)
 
+        on_profile_saved(db, old_buckets, profile_buckets(profile))
+        stats = db.query(ProgressStats).filter_by(user_id=user.id).first()
+        old_goal = old_buckets.get("goal")
+        if stats and stats.entries and old_goal != goal:
+            # move this user's weekly rate to their new goal cohort
+            on_weekly_rate_changed(db, old_goal, stats.weekly_rate, None)
+            on_weekly_rate_changed(db, goal, None, stats.weekly_rate)
+
         db.commit()
         db.close()
         flash("Profile updated.", "success")
@@ -180,9 +243,11 @@ def admin_dashboard():
 
     users_data = []
     for u in users:
-        profile = db.query(UserProfile).filter_by(user_id=u.id).first()
-        plan_count = db.query(Plan).filter_by(user_id=u.id).count()
-        progress_count = db.query(Progress).filter_by(user_id=u.id).count()
+        udb = user_session(u.id)
+        profile = udb.query(UserProfile).filter_by(user_id=u.id).first()
+        plan_count = udb.query(Plan).filter_by(user_id=u.id).count()
+        progress_count = udb.query(Progress).filter_by(user_id=u.id).count()
+        udb.close()
 
         users_data.append(
             {
@@ -197,18 +262,113 @@ def admin_dashboard():
     return render_template("admin_dashboard.html", users_data=users_data)
 
 
+@app.route("/admin/analytics")
+@admin_required
+def admin_analytics():
+    snapshot = cohort_snapshot()
+    return render_template("admin_analytics.html", stats=snapshot)
+
+
+@app.route("/admin/export/<dataset>.<fmt>")
+@admin_required
+def admin_export(dataset, fmt):
+    if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+        flash("Unknown export.", "warning")
+        return redirect(url_for("admin_dashboard"))
+
+    compressed = request.args.get("gzip", "1") != "0"
+    body = iter_export(dataset, fmt)
+    if compressed:
+        body = gzip_stream(body)
+        mimetype = "application/gzip"
+    else:
+        mimetype = EXPORT_FORMATS[fmt]
+
+    filename = export_filename(dataset, fmt, compressed)
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@app.route("/admin/plan-pdfs.zip")
+@admin_required
+def admin_plan_pdfs():
+    filters = {field: request.args.get(field) for field in ("goal", "activity_level", "experience_level")}
+    try:
+        user_ids = parse_user_ids(request.args.get("user_ids"))
+    except ValueError:
+        flash("User ids must be numbers separated by commas or spaces.", "warning")
+        return redirect(url_for("admin_dashboard"))
+    week_no = request.args.get("week", 1, type=int)
+
+    rows = latest_plan_rows(filters, user_ids)
+    return Response(
+        stream_with_context(iter_plan_zip(rows, week_no)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=fitai_plans.zip"},
+    )
+
+
+@app.cli.command("batch-pdfs")
+@click.option("--goal")
+@click.option("--activity-level")
+@click.option("--experience-level")
+@click.option("--user-ids", help="Comma-separated user ids.")
+@click.option("--week", default=1, show_default=True)
+@click.option("--workers", type=int, help="Worker processes (default: CPU count).")
+@click.option("--out", default="fitai_plans.zip", show_default=True)
+def batch_pdfs_command(goal, activity_level, experience_level, user_ids, week, workers, out):
+    """Write every matching user's latest plan PDF into one ZIP file."""
+    filters = {
+        "goal": goal,
+        "activity_level": activity_level,
+        "experience_level": experience_level,
+    }
+    try:
+        ids = parse_user_ids(user_ids)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--user-ids")
+
+    rows = latest_plan_rows(filters, ids)
+    with open(out, "wb") as f:
+        for chunk in iter_plan_zip(rows, week, workers):
+            f.write(chunk)
+    click.echo(f"Wrote {out}")
+
+
+@app.cli.command("reconcile-analytics")
+def reconcile_analytics_command():
+    """Rebuild admin analytics counters from the raw tables."""
+    db = SessionLocal()
+    reconcile(db)
+    db.close()
+    click.echo("Analytics counters reconciled.")
+
+
+@app.cli.command("rebalance-shards")
+@click.option("--from", "old_count", type=int, required=True, help="Current shard count (0 = unsharded).")
+@click.option("--to", "new_count", type=int, required=True, help="New shard count (0 = unsharded).")
+def rebalance_shards_command(old_count, new_count):
+    """Move per-user rows between shard files after changing FITAI_SHARDS."""
+    moved = rebalance(old_count, new_count)
+    click.echo(f"Moved {moved} rows. Restart with FITAI_SHARDS={new_count}.")
+
+
 @app.route("/dashboard")
 def dashboard():
     user = get_current_user()
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     profile = db.query(UserProfile).filter_by(user_id=user.id).first()
     plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
     progress_rows = (
         db.query(Progress).filter_by(user_id=user.id).order_by(Progress.day).all()
     )
+    trend = progress_summary(get_progress_stats(db, user.id), profile, plan)
     db.close()
 
     labels = [f"Day {p.day}" for p in progress_rows]
@@ -216,15 +376,7 @@ def dashboard():
 
     bmi_status = None
     if plan:
-        bmi_val = plan.bmi
-        if bmi_val < 18.5:
-            bmi_status = "Underweight"
-        elif bmi_val < 25:
-            bmi_status = "Normal"
-        elif bmi_val < 30:
-            bmi_status = "Overweight"
-        else:
-            bmi_status = "Obese"
+        bmi_status = bmi_band(plan.bmi)
 
     return render_template(
         "dashboard.html",
@@ -232,6 +384,7 @@ def dashboard():
         profile=profile,
         plan=plan,
         progress=progress_rows,
+        trend=trend,
         chart_labels=labels,
         chart_weights=weights,
         bmi_status=bmi_status,
@@ -244,7 +397,7 @@ def generate_plans():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     profile = db.query(UserProfile).filter_by(user_id=user.id).first()
     if not profile:
         db.close()
@@ -267,6 +420,8 @@ def generate_plans():
     }
 
     result = build_complete_plan(profile_dict)
+    # week 1 of the program is the week after the latest check-in
+    result["workout_plan"]["start_day"] = _last_checkin_day(db, user.id) + 1
 
     new_plan = Plan(
         user_id=user.id,
@@ -277,6 +432,7 @@ def generate_plans():
         workout_plan=str(result["workout_plan"]),
     )
     db.add(new_plan)
+    on_plan_generated(db)
     db.commit()
     db.close()
 
@@ -290,22 +446,31 @@ def plans():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
-    db.close()
-
     if not plan:
+        db.close()
         flash("No plan found. Generate one first.", "info")
         return redirect(url_for("generate_plans"))
 
     diet_plan = ast.literal_eval(plan.diet_plan)
     workout_plan = ast.literal_eval(plan.workout_plan)
+    week_no = request.args.get("week", type=int)
+    if week_no is None:
+        week_no = current_program_week(db, user.id, workout_plan)
+    db.close()
+
+    # only the requested week (default: the user's current one) gets built
+    program_week = get_program_week(workout_plan, week_no)
+    if program_week:
+        workout_plan["workouts"] = program_week["workouts"]
 
     return render_template(
         "plans.html",
         plan=plan,
         diet_plan=diet_plan,
         workout_plan=workout_plan,
+        program_week=program_week,
     )
 
 
@@ -315,166 +480,34 @@ def download_plan():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     plan = (
         db.query(Plan)
         .filter_by(user_id=user.id)
         .order_by(Plan.id.desc())
         .first()
     )
+    week_no = request.args.get("week", type=int)
+    if plan and week_no is None:
+        week_no = current_program_week(db, user.id, ast.literal_eval(plan.workout_plan))
     db.close()
 
     if not plan:
         flash("No plan found to download.", "info")
         return redirect(url_for("plans"))
 
-    diet_plan = ast.literal_eval(plan.diet_plan)
-    workout_plan = ast.literal_eval(plan.workout_plan)
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    margin_x = 25 * mm
-    margin_y = 25 * mm
-    header_height = 32
-    y = height - margin_y
-
-    # HEADER BAR
-    c.setFillColorRGB(0.09, 0.20, 0.45)
-    c.rect(0, height - header_height - 10, width, header_height + 10, stroke=0, fill=1)
-    c.setFillColorRGB(0.15, 0.40, 0.90)
-    c.rect(0, height - header_height, width, header_height, stroke=0, fill=1)
-
-    logo_radius = 9
-    logo_cx = margin_x
-    logo_cy = height - header_height / 2 - 5
-
-    c.setFillColor(colors.white)
-    c.circle(logo_cx, logo_cy, logo_radius, stroke=0, fill=1)
-
-    c.setFillColorRGB(0.11, 0.27, 0.65)
-    c.setFont("Helvetica-Bold", 11)
-    c.drawCentredString(logo_cx, logo_cy - 3, "F")
-
-    text_x = logo_cx + 2 * logo_radius + 6
-    text_y = logo_cy + 2
-
-    c.setFillColor(colors.white)
-    c.setFont("Helvetica-Bold", 15)
-    c.drawString(text_x, text_y, "FitAI Planner")
-
-    c.setFont("Helvetica", 8.5)
-    c.setFillColorRGB(0.88, 0.94, 1)
-    c.drawString(text_x, text_y - 12, "Smart Fitness & Diet Assistant")
-
-    title = "Personalised Fitness & Diet Plan"
-    c.setFont("Helvetica-Bold", 11)
-    c.setFillColor(colors.white)
-    c.drawCentredString(width / 2, height - header_height + 4, title)
-
-    y = height - header_height - 20
-
-    # USER SUMMARY
-    c.setFont("Helvetica-Bold", 11)
-    c.setFillColor(colors.black)
-    c.drawString(margin_x, y, f"👤  User: {user.name}")
-    y -= 16
-
-    c.setFont("Helvetica", 9.5)
-    c.drawString(margin_x, y, f"BMI: {plan.bmi}     BMR: {plan.bmr} kcal/day")
-    y -= 13
-    c.drawString(margin_x, y, f"Target Calories: {plan.calories_target} kcal/day")
-    y -= 18
-
-    c.setStrokeColorRGB(0.8, 0.85, 0.9)
-    c.line(margin_x, y, width - margin_x, y)
-    y -= 18
-
-    # DIET PLAN
-    c.setFont("Helvetica-Bold", 11.5)
-    c.setFillColorRGB(0.11, 0.27, 0.65)
-    c.drawString(margin_x, y, "🍽  Diet Plan")
-    y -= 14
-
-    c.setFont("Helvetica", 9)
-    c.setFillColor(colors.black)
-    focus = diet_plan.get("focus", "")
-    c.drawString(margin_x, y, focus[:110])
-    y -= 18
-
-    box_height = 72
-    c.setStrokeColorRGB(0.82, 0.86, 0.94)
-    c.setFillColorRGB(0.97, 0.98, 1)
-    c.roundRect(
-        margin_x,
-        y - box_height,
-        width - 2 * margin_x,
-        box_height,
-        6,
-        stroke=1,
-        fill=1,
-    )
-
-    row_y = y - 12
-
-    def diet_row(label, value):
-        nonlocal row_y
-        c.setFont("Helvetica-Bold", 9)
-        c.setFillColorRGB(0.12, 0.16, 0.26)
-        c.drawString(margin_x + 6, row_y, label)
-        c.setFont("Helvetica", 9)
-        c.setFillColor(colors.black)
-        c.drawString(margin_x + 70, row_y, (value or "")[:80])
-        row_y -= 14
-
-    diet_row("Breakfast:", diet_plan.get("breakfast", ""))
-    diet_row("Lunch:", diet_plan.get("lunch", ""))
-    diet_row("Dinner:", diet_plan.get("dinner", ""))
-    diet_row("Snacks:", diet_plan.get("snacks", ""))
-
-    y = y - box_height - 26
-
-    # WORKOUT PLAN
-    if y < margin_y + 80:
-        c.showPage()
-        y = height - margin_y
-
-    c.setFont("Helvetica-Bold", 11.5)
-    c.setFillColorRGB(0.11, 0.27, 0.65)
-    c.drawString(margin_x, y, "🏋️  Workout Plan")
-    y -= 14
-
-    c.setFont("Helvetica", 9)
-    c.setFillColor(colors.black)
-    c.drawString(margin_x, y, workout_plan.get("level", ""))
-    y -= 16
-
-    workouts = workout_plan.get("workouts", [])
-
-    for i, w in enumerate(workouts, start=1):
-        if y < 40:
-            c.showPage()
-            y = height - margin_y
-            c.setFont("Helvetica-Bold", 10.5)
-            c.drawString(margin_x, y, "Workout Plan (continued)")
-            y -= 16
-            c.setFont("Helvetica", 9)
-
-        c.drawString(margin_x, y, f"Day {i}: {w}")
-        y -= 13
-
-    c.setFont("Helvetica-Oblique", 8)
-    c.setFillColorRGB(0.45, 0.5, 0.6)
-    c.drawString(
-        margin_x,
-        18,
-        "Generated by FitAI Planner • This plan is for educational purposes only.",
+    buffer = BytesIO(
+        plan_pdf(
+            user.name,
+            plan.bmi,
+            plan.bmr,
+            plan.calories_target,
+            plan.diet_plan,
+            plan.workout_plan,
+            week_no,
+        )
     )
 
-    c.showPage()
-    c.save()
-
     buffer.seek(0)
     return send_file(
         buffer,
@@ -490,7 +523,7 @@ def save_custom_workout():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
     if not plan:
         db.close()
@@ -523,29 +556,208 @@ def save_custom_workout():
     db.commit()
     db.close()
 
+    # check each filled-in day against the exercise library
+    library = exercise_library()
+    unknown_days = [
+        str(i)
+        for i, w in enumerate(workouts, start=1)
+        if w and not library.find_in_text(w)
+    ]
+
     flash("Your custom workout plan has been saved.", "success")
+    if unknown_days:
+        flash(
+            "No known exercises found for day(s) "
+            + ", ".join(unknown_days)
+            + ". Check the spelling or use the exercise search for ideas.",
+            "warning",
+        )
     return redirect(url_for("plans"))
 
 
+@app.route("/exercises/search")
+def search_exercises():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "login required"}), 401
+
+    results = exercise_library().search(
+        muscle=request.args.get("muscle"),
+        equipment=request.args.get("equipment"),
+        modality=request.args.get("modality"),
+        level=request.args.get("level"),
+        q=request.args.get("q"),
+        limit=max(1, min(request.args.get("limit", 20, type=int), 100)),
+    )
+    return jsonify({"results": results})
+
+
+def _cached_json(payload):
+    """
+    JSON with an ETag: the service worker revalidates in the background
+    and gets a body-less 304 when nothing changed.
+    """
+    response = jsonify(payload)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/api/plan")
+def api_plan():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "login required"}), 401
+
+    db = user_session(user.id)
+    plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
+    if not plan:
+        db.close()
+        return _cached_json({"user_id": user.id, "plan": None})
+
+    diet_plan = ast.literal_eval(plan.diet_plan)
+    workout_plan = ast.literal_eval(plan.workout_plan)
+    week_no = current_program_week(db, user.id, workout_plan)
+    db.close()
+    program_week = get_program_week(workout_plan, week_no)
+    if program_week:
+        workout_plan["workouts"] = program_week["workouts"]
+
+    return _cached_json({
+        "user_id": user.id,
+        "plan": {
+            "id": plan.id,
+            "bmi": plan.bmi,
+            "bmr": plan.bmr,
+            "calories_target": plan.calories_target,
+            "diet": diet_plan,
+            "workout": workout_plan,
+            "week": program_week["week"] if program_week else None,
+            "week_note": program_week["note"] if program_week else None,
+        },
+    })
+
+
+@app.route("/api/progress")
+def api_progress():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "login required"}), 401
+
+    db = user_session(user.id)
+    profile = db.query(UserProfile).filter_by(user_id=user.id).first()
+    plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
+    rows = (
+        db.query(Progress.day, Progress.weight_kg)
+        .filter_by(user_id=user.id)
+        .order_by(Progress.day)
+        .all()
+    )
+    trend = progress_summary(get_progress_stats(db, user.id), profile, plan)
+    db.close()
+
+    return _cached_json({
+        "user_id": user.id,
+        "entries": [{"day": day, "weight": weight} for day, weight in rows],
+        "trend": trend,
+    })
+
+
+MAX_PROGRESS_DAY = 3660      # ten years of daily check-ins
+MAX_WEIGHT_KG = 500
+MAX_BULK_ENTRIES = 400
+
+
+def _progress_entry(day, weight):
+    """(day, weight) if both are sane, else None (rejects NaN / Infinity)."""
+    try:
+        day, weight = int(day), float(weight)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if not 1 <= day <= MAX_PROGRESS_DAY:
+        return None
+    if not math.isfinite(weight) or not 0 < weight <= MAX_WEIGHT_KG:
+        return None
+    return day, weight
+
+
+def _parse_progress_entries(data):
+    """
+    ([(day, weight), ...], [rejected index, ...]) from a bulk JSON body;
+    None if the body itself is malformed. One bad entry does not cost
+    the rest of the batch.
+    """
+    entries = data.get("entries") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not 0 < len(entries) <= MAX_BULK_ENTRIES:
+        return None
+    parsed, rejected = [], []
+    for i, entry in enumerate(entries):
+        parsed_entry = None
+        if isinstance(entry, dict):
+            parsed_entry = _progress_entry(entry.get("day"), entry.get("weight"))
+        if parsed_entry is None:
+            rejected.append(i)
+        else:
+            parsed.append(parsed_entry)
+    return parsed, rejected
+
+
 @app.route("/add-progress", methods=["POST"])
 def add_progress():
+    """
+    One check-in from the dashboard form, or a JSON batch
+    {"entries": [{"day": 3, "weight": 81.2}, ...]} replayed by the
+    offline queue (later entries for the same day win). The batch reply
+    lists the indexes of entries that were not saved.
+    """
     user = get_current_user()
+    bulk = request.is_json
     if not user:
+        if bulk:
+            return jsonify({"error": "login required"}), 401
         return redirect(url_for("login"))
 
-    day = int(request.form["day"])
-    weight = float(request.form["weight"])
-
-    db = SessionLocal()
-    existing = db.query(Progress).filter_by(user_id=user.id, day=day).first()
-    if existing:
-        existing.weight_kg = weight
+    if bulk:
+        parsed = _parse_progress_entries(request.get_json(silent=True))
+        if parsed is None:
+            return jsonify({
+                "error": f"expected 1–{MAX_BULK_ENTRIES} entries: "
+                f"[{{day: 1–{MAX_PROGRESS_DAY}, weight: kg}}, ...]"
+            }), 400
+        entries, rejected = parsed
+        if not entries:
+            return jsonify({"saved": 0, "rejected": rejected})
     else:
-        rec = Progress(user_id=user.id, day=day, weight_kg=weight)
-        db.add(rec)
+        entry = _progress_entry(request.form.get("day"), request.form.get("weight"))
+        if entry is None:
+            flash("Please enter a valid day and weight.", "warning")
+            return redirect(url_for("dashboard"))
+        entries = [entry]
 
+    db = user_session(user.id)
+    profile = db.query(UserProfile).filter_by(user_id=user.id).first()
+    stats = db.query(ProgressStats).filter_by(user_id=user.id).first()
+    old_rate = stats.weekly_rate if stats and stats.entries else None
+
+    # in day order, so new days keep taking the O(1) stats path
+    for day, weight in sorted(entries, key=lambda e: e[0]):
+        existing = db.query(Progress).filter_by(user_id=user.id, day=day).first()
+        if existing:
+            existing.weight_kg = weight
+        else:
+            rec = Progress(user_id=user.id, day=day, weight_kg=weight)
+            db.add(rec)
+            db.flush()  # a repeated day later in the batch must find this row
+
+        stats = record_progress(db, user.id, day, weight, edited=existing is not None)
+
+    if profile:
+        on_weekly_rate_changed(db, profile.goal, old_rate, stats.weekly_rate)
     db.commit()
     db.close()
+
+    if bulk:
+        return jsonify({"saved": len(entries), "rejected": rejected})
     flash("Progress updated.", "success")
     return redirect(url_for("dashboard"))
 
@@ -556,8 +768,14 @@ def reset_progress():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
+    profile = db.query(UserProfile).filter_by(user_id=user.id).first()
+    stats = db.query(ProgressStats).filter_by(user_id=user.id).first()
+    if profile and stats and stats.entries:
+        on_weekly_rate_changed(db, profile.goal, stats.weekly_rate, None)
+
     db.query(Progress).filter_by(user_id=user.id).delete()
+    clear_progress_stats(db, user.id)
     db.commit()
     db.close()
 
@@ -565,6 +783,149 @@ def reset_progress():
     return redirect(url_for("dashboard"))
 
 
+# ---------------------------------------------------------
+# FitAI Coach helpers
+# ---------------------------------------------------------
+def _last_checkin_day(db, user_id):
+    last = (
+        db.query(Progress.day)
+        .filter_by(user_id=user_id)
+        .order_by(Progress.day.desc())
+        .first()
+    )
+    return last[0] if last else 0
+
+
+def current_program_week(db, user_id, workout_plan):
+    """
+    Program week the user is in: whole weeks of check-ins since the plan
+    started (its "start_day"; plans saved before that count from day 1).
+    """
+    start_day = (workout_plan or {}).get("start_day", 1)
+    last_day = _last_checkin_day(db, user_id)
+    if last_day < start_day:
+        return 1
+    return (last_day - start_day) // 7 + 1
+
+
+COACH_TOPIC_WORDS = (
+    "progress", "weight", "plateau", "calorie", "kcal", "meal", "diet", "eat",
+    "workout", "train", "exercise", "fat", "lose", "loss",
+)
+FOLLOW_UP_WORDS = ("more", "another", "other", "else", "again", "instead", "why", "what about", "and ")
+WEEK_RE = re.compile(r"\bweek\s*(\d+)")
+
+
+def _has_topic(text):
+    if any(w in text for w in COACH_TOPIC_WORDS):
+        return True
+    return bool(exercise_library().muscles_in(text))
+
+
+def _follow_up_text(text, history):
+    """
+    Short follow-ups ("and on week 3?", "more please") carry no topic of
+    their own; borrow the topic of the user's last on-topic message.
+    """
+    if not history or len(text.split()) > 5 or _has_topic(text):
+        return text
+    if not any(w in text for w in FOLLOW_UP_WORDS):
+        return text
+    previous = next(
+        (t.lower() for role, t in reversed(history) if role == "user" and _has_topic(t.lower())),
+        None,
+    )
+    return f"{previous} {text}" if previous else text
+
+
+def generate_coach_reply(
+    user, profile, plan, diet_plan, workout_plan, message, week_no=1, trend=None, history=None
+):
+    text = _follow_up_text((message or "").lower(), history)
+
+    if not plan:
+        return (
+            "I don't have a plan for you yet. Complete your profile and generate "
+            "a plan, then I can answer using your numbers."
+        )
+
+    if trend and ("progress" in text or "weight" in text or "plateau" in text):
+        lines = [
+            f"Trend weight: {trend['trend_weight']} kg "
+            f"({trend['weekly_rate']:+} kg/week over {trend['entries']} check-ins)."
+        ]
+        if trend["planned_rate"] is not None:
+            lines.append(f"Your calorie target is set for about {trend['planned_rate']:+} kg/week.")
+        if trend["eta_weeks"]:
+            lines.append(
+                f"At this pace you reach ~{trend['target_weight']} kg in about {trend['eta_weeks']} weeks."
+            )
+        if trend["plateau"]:
+            lines.append(
+                "Your weight has been flat for 2+ weeks – tighten portions or "
+                "adjust calories by ~150 kcal."
+            )
+        return "\n".join(lines)
+
+    if "calorie" in text or "kcal" in text:
+        return (
+            f"Your daily target is about {plan.calories_target} kcal "
+            f"(BMR {int(plan.bmr)} kcal, BMI {plan.bmi}). "
+            "Spread it across 3 meals and 1–2 snacks."
+        )
+
+    if "meal" in text or "diet" in text or "eat" in text:
+        return (
+            f"{diet_plan.get('focus', '')}\n"
+            f"Breakfast: {diet_plan.get('breakfast', '')}\n"
+            f"Lunch: {diet_plan.get('lunch', '')}\n"
+            f"Dinner: {diet_plan.get('dinner', '')}\n"
+            f"Snacks: {diet_plan.get('snacks', '')}"
+        )
+
+    library = exercise_library()
+    muscles = library.muscles_in(text)
+    if muscles:
+        level = profile.experience_level if profile else "beginner"
+        # on "more" / "others" skip what the coach already suggested
+        said = " ".join(t for role, t in history or [] if role == "bot")
+        lines = []
+        for muscle in muscles[:3]:
+            names = [
+                ex["name"] for ex in library.search(muscle=muscle, level=level, limit=12)
+                if ex["name"] not in said
+            ][:4]
+            if names:
+                lines.append(f"{muscle.replace('_', ' ').capitalize()}: {', '.join(names)}")
+        if lines:
+            return "Good options at your level:\n" + "\n".join(lines)
+
+    if "workout" in text or "train" in text or "exercise" in text:
+        # "week 3" in the message (the follow-up's, if borrowed) beats the current week
+        asked = WEEK_RE.findall(text)
+        program_week = get_program_week(workout_plan, int(asked[-1]) if asked else week_no)
+        if program_week:
+            days = "\n".join(
+                f"Day {i}: {w}" for i, w in enumerate(program_week["workouts"], start=1)
+            )
+            return f"Week {program_week['week']} – {program_week['note']}\n{days}"
+        days = "\n".join(
+            f"Day {i}: {w}" for i, w in enumerate(workout_plan.get("workouts", []), start=1)
+        )
+        return f"{workout_plan.get('level', '')}\n{days}"
+
+    if "fat" in text or "lose" in text or "loss" in text:
+        return (
+            "Aim for about 0.5–1% of body weight per week. Keep protein high, "
+            "stay close to your calorie target and keep training hard – "
+            "faster than that usually costs muscle."
+        )
+
+    return (
+        f"Hi {user.name}! Ask me about your calories, meals, this week's "
+        "workout or fat-loss pace and I'll answer from your latest plan."
+    )
+
 
 @app.route("/trainer", methods=["GET", "POST"])
 def trainer():
@@ -572,7 +933,7 @@ def trainer():
     if not user:
         return redirect(url_for("login"))
 
-    db = SessionLocal()
+    db = user_session(user.id)
     profile = db.query(UserProfile).filter_by(user_id=user.id).first()
     plan = db.query(Plan).filter_by(user_id=user.id).order_by(Plan.id.desc()).first()
 
@@ -587,12 +948,35 @@ def trainer():
 
     # POST: chat message
     data = request.get_json(silent=True) or {}
-    message = data.get("message", "")
+    message = (data.get("message") or "").strip()
 
-    reply = generate_coach_reply(user, profile, plan, diet_plan, workout_plan, message)
+    week_no = current_program_week(db, user.id, workout_plan)
+    trend = progress_summary(get_progress_stats(db, user.id), profile, plan)
+    history = recent_turns(db, user.id) if message else None
+    reply = generate_coach_reply(
+        user, profile, plan, diet_plan, workout_plan, message, week_no, trend, history
+    )
+    if message:
+        append_message(db, user.id, "user", message)
+        append_message(db, user.id, "bot", reply)
     db.close()
     return jsonify({"reply": reply})
 
 
+@app.route("/trainer/history")
+def trainer_history():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "login required"}), 401
+
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", 30, type=int)
+
+    db = user_session(user.id)
+    messages, next_before = history_page(db, user.id, before, limit)
+    db.close()
+    return jsonify({"messages": messages, "next_before": next_before})
+
+
 if __name__ == "__main__":
     app.run(debug=True)
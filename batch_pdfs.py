@@ -0,0 +1,163 @@
+# batch_pdfs.py
+"""
+Batch export of every matching user's latest plan as PDFs in one ZIP.
+
+PDFs are rendered in a process pool and written into the archive as they
+finish. The ZIP is produced as a stream of byte chunks (zipfile writes
+data descriptors when the output can't seek), so the whole archive is
+never held in memory. Cached PDFs skip the pool entirely.
+"""
+
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from sqlalchemy import func
+
+from database import SessionLocal, shard_sessions
+from models import Plan, User, UserProfile
+from plan_pdf import cached_pdf, pdf_cache_key, plan_page, render_plan_pdf, store_pdf
+
+# renders in flight per worker; bounds memory when the client reads slowly
+IN_FLIGHT_PER_WORKER = 4
+
+FILTER_FIELDS = ("goal", "activity_level", "experience_level")
+
+
+class _ChunkSink:
+    """Write-only file object; the ZIP writer appends, the generator drains."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _with_names(db, plans):
+    ids = [row[0] for row in plans]
+    names = dict(db.query(User.id, User.name).filter(User.id.in_(ids)))
+    for user_id, *plan_fields in plans:
+        if user_id in names:
+            yield (user_id, names[user_id], *plan_fields)
+
+
+def latest_plan_rows(filters=None, user_ids=None, batch_size=500):
+    """
+    (user_id, name, bmi, bmr, calories_target, diet_plan, workout_plan)
+    for each matching user's newest plan, streamed shard by shard.
+    """
+    filters = filters or {}
+    profile_filters = {k: v for k, v in filters.items() if k in FILTER_FIELDS and v}
+
+    db = SessionLocal()  # users directory, for names
+    try:
+        for sdb in shard_sessions():
+            try:
+                latest = (
+                    sdb.query(func.max(Plan.id).label("plan_id"))
+                    .group_by(Plan.user_id)
+                    .subquery()
+                )
+                query = sdb.query(
+                    Plan.user_id,
+                    Plan.bmi,
+                    Plan.bmr,
+                    Plan.calories_target,
+                    Plan.diet_plan,
+                    Plan.workout_plan,
+                ).join(latest, latest.c.plan_id == Plan.id)
+                if profile_filters:
+                    query = query.join(UserProfile, UserProfile.user_id == Plan.user_id).filter_by(
+                        **profile_filters
+                    )
+                if user_ids:
+                    query = query.filter(Plan.user_id.in_(user_ids))
+
+                batch = []
+                for row in query.order_by(Plan.user_id).yield_per(batch_size):
+                    batch.append(tuple(row))
+                    if len(batch) == batch_size:
+                        yield from _with_names(db, batch)
+                        batch = []
+                if batch:
+                    yield from _with_names(db, batch)
+            finally:
+                sdb.close()
+    finally:
+        db.close()
+
+
+def _archive_name(user_id, name):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", name or "").strip("_") or "user"
+    return f"{user_id:06d}_{slug}.pdf"
+
+
+def _write_entry(zf, sink, arcname, data):
+    info = zipfile.ZipInfo(arcname)
+    info.compress_type = zipfile.ZIP_STORED  # PDFs are already compressed
+    zf.writestr(info, data)
+    return sink.drain()
+
+
+def iter_plan_zip(rows, week_no=1, workers=None):
+    """Yield the bytes of a ZIP holding one plan PDF per row."""
+    sink = _ChunkSink()
+    zf = zipfile.ZipFile(sink, "w")
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = IN_FLIGHT_PER_WORKER * workers
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def finish(done):
+            for future in done:
+                arcname, key = pending.pop(future)
+                data = future.result()
+                store_pdf(key, data)
+                yield _write_entry(zf, sink, arcname, data)
+
+        for user_id, name, *plan_fields in rows:
+            page = plan_page(name, *plan_fields, week_no)
+            key = pdf_cache_key(page)
+            arcname = _archive_name(user_id, name)
+
+            data = cached_pdf(key)
+            if data is not None:
+                yield _write_entry(zf, sink, arcname, data)
+                continue
+
+            pending[pool.submit(render_plan_pdf, page)] = (arcname, key)
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finish(done)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finish(done)
+
+    zf.close()
+    yield sink.drain()
+
+
+def parse_user_ids(text):
+    """
+    "3, 7 12" -> [3, 7, 12]; empty -> [] (no id filter). Raises ValueError
+    on anything else, so a typo never widens the export to every user.
+    """
+    parts = [part for part in re.split(r"[,\s]+", text or "") if part]
+    bad = [part for part in parts if not part.isdigit()]
+    if bad:
+        raise ValueError(f"not a user id: {', '.join(bad)}")
+    return [int(part) for part in parts]
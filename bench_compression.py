@@ -0,0 +1,80 @@
+# bench_compression.py
+"""
+Throughput benchmark for CompressionMiddleware.
+
+Serves representative payloads (a plans-page-sized HTML document and a
+year of progress chart JSON) through a tiny WSGI app, with and without
+the middleware, and prints requests/second plus bytes on the wire.
+
+    python bench_compression.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+
+from compression import CompressionMiddleware, brotli
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _payloads():
+    with open(os.path.join(HERE, "templates", "base.html"), encoding="utf-8") as f:
+        base = f.read()
+    with open(os.path.join(HERE, "templates", "plans.html"), encoding="utf-8") as f:
+        plans = f.read()
+    html = base.replace("{% block content %}{% endblock %}", plans).encode("utf-8")
+
+    chart = {
+        "labels": [f"Day {d}" for d in range(1, 366)],
+        "weights": [round(85 - d * 0.02, 1) for d in range(365)],
+    }
+    data = json.dumps(chart).encode("utf-8")
+    return [("html", "text/html; charset=utf-8", html), ("json", "application/json", data)]
+
+
+def _make_app(mimetype, body):
+    def app(environ, start_response):
+        start_response(
+            "200 OK", [("Content-Type", mimetype), ("Content-Length", str(len(body)))]
+        )
+        return [body]
+
+    return app
+
+
+def _run(app, accept, iterations):
+    environ = {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": accept}
+    size = 0
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        size = sum(len(chunk) for chunk in app(dict(environ), start_response))
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, size
+
+
+def main(iterations=2000):
+    encodings = [("identity", "")]
+    encodings.append(("gzip", "gzip"))
+    if brotli is not None:
+        encodings.append(("br", "br"))
+
+    print(f"{'payload':<8}{'encoding':<10}{'req/s':>12}{'bytes':>10}")
+    for name, mimetype, body in _payloads():
+        plain = _make_app(mimetype, body)
+        rps, size = _run(plain, "", iterations)
+        print(f"{name:<8}{'baseline':<10}{rps:>12.0f}{size:>10}")
+
+        wrapped = CompressionMiddleware(plain)
+        for label, accept in encodings:
+            rps, size = _run(wrapped, accept, iterations)
+            print(f"{name:<8}{label:<10}{rps:>12.0f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,111 @@
+# bench_shards.py
+"""
+Write-throughput benchmark for FITAI_SHARDS.
+
+For each shard count, builds a fresh set of databases in a temp folder,
+registers USERS users with a profile and a plan, then runs WORKERS
+processes that post check-ins to /add-progress through the Flask test
+client (the full request path: stats update, counter bumps, commit).
+Prints check-ins per second and failed requests per shard count.
+
+    python bench_shards.py [shard counts...]      # default: 0 1 2 4 8
+"""
+
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+USERS = 16
+WORKERS = 8
+CHECKINS_PER_USER = 40
+
+
+def _client(app, n):
+    c = app.test_client()
+    c.post("/login", data=dict(email=f"bench{n}@example.com", password="bench"))
+    return c
+
+
+def _worker(users, start, results):
+    sys.path.insert(0, HERE)
+    import app as fitai
+
+    clients = [_client(fitai.app, n) for n in users]
+    start.wait()
+
+    ok = failed = 0
+    t0 = time.perf_counter()
+    for day in range(2, CHECKINS_PER_USER + 2):
+        for c in clients:
+            r = c.post("/add-progress", data={"day": day, "weight": 80 - day * 0.05})
+            if r.status_code == 302:
+                ok += 1
+            else:
+                failed += 1
+    results.put((ok, failed, time.perf_counter() - t0))
+
+
+def _setup():
+    sys.path.insert(0, HERE)
+    import app as fitai
+
+    for n in range(USERS):
+        c = fitai.app.test_client()
+        c.post("/register", data=dict(name=f"Bench {n}", email=f"bench{n}@example.com", password="bench"))
+        c.post("/login", data=dict(email=f"bench{n}@example.com", password="bench"))
+        c.post(
+            "/profile",
+            data=dict(
+                age=30, gender="male", height=180, weight=80,
+                activity="moderate", goal="lose", experience_level="beginner",
+            ),
+        )
+        c.get("/generate-plans?diet=veg&workout=strength")
+        c.post("/add-progress", data={"day": 1, "weight": 80})
+
+
+def _child():
+    """One shard count, run inside the temp folder with FITAI_SHARDS set."""
+    _setup()
+
+    ctx = mp.get_context("spawn")
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(list(range(w, USERS, WORKERS)), start, results))
+        for w in range(WORKERS)
+    ]
+    for p in procs:
+        p.start()
+    time.sleep(2)  # let every worker import the app and log in
+
+    t0 = time.perf_counter()
+    start.set()
+    totals = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+
+    ok = sum(t[0] for t in totals)
+    failed = sum(t[1] for t in totals)
+    print(f"{os.environ['FITAI_SHARDS']:>6}{ok / elapsed:>14.0f}{failed:>8}{elapsed:>10.1f}")
+
+
+def main(shard_counts):
+    print(f"{'shards':>6}{'check-ins/s':>14}{'failed':>8}{'secs':>10}")
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, FITAI_SHARDS=str(shards))
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=tmp, env=env, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--child"]:
+        _child()
+    else:
+        main([int(a) for a in sys.argv[1:]] or [0, 1, 2, 4, 8])
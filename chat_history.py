@@ -0,0 +1,129 @@
+# chat_history.py
+"""
+Trainer chat history for FitAI Planner.
+
+Every turn is appended to the chat_messages table. The last RECENT_TURNS
+turns of recently active users are also kept in memory as fixed-size
+ring buffers (deque with maxlen), so building a reply never reads the
+whole history. The buffers are per process and hold at most
+CACHED_USERS users; a user who drops out is reloaded from the table on
+their next message. Other processes write to the same table, so a
+buffer is only used while its last message id still matches the user's
+newest id (one lookup on the (user_id, id) index); otherwise it is
+reloaded.
+
+Older messages are read in pages with an id cursor (`before`), so a long
+history costs one indexed range scan per page instead of an OFFSET walk.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import func
+
+from models import ChatMessage
+
+RECENT_TURNS = 12
+CACHED_USERS = 1000
+
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+MAX_MESSAGE_CHARS = 2000
+
+_recent = OrderedDict()  # user_id -> deque of (id, role, text), LRU order
+_lock = threading.Lock()
+
+
+def _load_recent(db, user_id):
+    rows = (
+        db.query(ChatMessage.id, ChatMessage.role, ChatMessage.text)
+        .filter_by(user_id=user_id)
+        .order_by(ChatMessage.id.desc())
+        .limit(RECENT_TURNS)
+        .all()
+    )
+    return deque((tuple(row) for row in reversed(rows)), maxlen=RECENT_TURNS)
+
+
+def _newest_id(db, user_id, below=None):
+    query = db.query(func.max(ChatMessage.id)).filter(ChatMessage.user_id == user_id)
+    if below is not None:
+        query = query.filter(ChatMessage.id < below)
+    return query.scalar()
+
+
+def _last_id(turns):
+    return turns[-1][0] if turns else None
+
+
+def _buffer(db, user_id):
+    newest = _newest_id(db, user_id)
+    with _lock:
+        turns = _recent.get(user_id)
+        if turns is not None and _last_id(turns) == newest:
+            _recent.move_to_end(user_id)
+            return turns
+
+    # not cached, or another process has written since
+    turns = _load_recent(db, user_id)
+    with _lock:
+        _recent[user_id] = turns
+        _recent.move_to_end(user_id)
+        while len(_recent) > CACHED_USERS:
+            _recent.popitem(last=False)
+    return turns
+
+
+def recent_turns(db, user_id):
+    """[(role, text), ...] for the last RECENT_TURNS turns, oldest first."""
+    turns = _buffer(db, user_id)
+    with _lock:
+        return [(role, text) for _, role, text in turns]
+
+
+def append_message(db, user_id, role, text):
+    """Store one turn and push it onto the user's ring buffer. Commits."""
+    msg = ChatMessage(
+        user_id=user_id,
+        role=role,
+        text=text[:MAX_MESSAGE_CHARS],
+        created_at=int(time.time()),
+    )
+    db.add(msg)
+    db.commit()
+
+    # only extend a buffer that ends right before this message; one that
+    # missed a turn (written elsewhere) is dropped and reloaded when needed
+    previous = _newest_id(db, user_id, below=msg.id)
+    with _lock:
+        turns = _recent.get(user_id)
+        if turns is not None:
+            if _last_id(turns) == previous:
+                turns.append((msg.id, msg.role, msg.text))
+            else:
+                del _recent[user_id]
+    return msg
+
+
+def history_page(db, user_id, before=None, limit=PAGE_SIZE):
+    """
+    One page of history, oldest first, ending just before message id
+    `before` (or at the newest message). Returns (messages, next_before);
+    next_before is None once the start of the history is reached.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(ChatMessage).filter_by(user_id=user_id)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    messages = [
+        {"id": row.id, "role": row.role, "text": row.text, "created_at": row.created_at}
+        for row in reversed(rows)
+    ]
+    next_before = rows[-1].id if has_more else None
+    return messages, next_before
@@ -0,0 +1,236 @@
+# cohort_rollups.py
+"""
+Cohort analytics rollups for the admin panel.
+
+Counters in the analytics_counters table are bumped in the same
+transaction as the write that changes them (profile save, plan
+generation, progress check-ins), so /admin/analytics only reads a
+handful of pre-aggregated rows no matter how many users there are.
+With sharding on, the counters are sharded like the per-user tables:
+each write only bumps its own shard's rows, and reads sum the shards.
+
+`reconcile()` rebuilds the counters from the raw tables with GROUP BY
+queries and is meant to run periodically (`flask reconcile-analytics`)
+to repair any drift. Plan volume per day is only ever counted on write
+because plans carry no timestamp.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, update
+
+from ai_engine import _calc_bmi
+from database import shard_engines, shard_for, shard_sessions
+from models import AnalyticsCounter, Plan, ProgressStats, User, UserProfile
+
+# metrics rebuilt by reconcile(); everything else is write-only history
+PROFILE_METRICS = ("bmi_band", "goal", "activity_level", "experience_level")
+RECONCILED_METRICS = PROFILE_METRICS + (
+    "users_total",
+    "plans_total",
+    "weekly_rate_sum",
+    "weekly_rate_users",
+)
+
+PLANS_BY_DAY_WINDOW = 30
+
+
+def bmi_band(bmi):
+    if bmi < 18.5:
+        return "Underweight"
+    if bmi < 25:
+        return "Normal"
+    if bmi < 30:
+        return "Overweight"
+    return "Obese"
+
+
+def profile_buckets(profile):
+    """Bucket of each profile metric for one profile (None → no profile)."""
+    if profile is None:
+        return {}
+    return {
+        "bmi_band": bmi_band(_calc_bmi(profile.weight_kg, profile.height_cm)),
+        "goal": profile.goal,
+        "activity_level": profile.activity_level,
+        "experience_level": profile.experience_level or "beginner",
+    }
+
+
+def bump(db, metric, bucket, delta=1):
+    """Add `delta` to a counter, creating it on first use."""
+    result = db.execute(
+        update(AnalyticsCounter)
+        .where(AnalyticsCounter.metric == metric, AnalyticsCounter.bucket == str(bucket))
+        .values(value=AnalyticsCounter.value + delta)
+    )
+    if result.rowcount == 0:
+        db.add(AnalyticsCounter(metric=metric, bucket=str(bucket), value=delta))
+        db.flush()
+
+
+# ---------------------------------------------------------
+# Write hooks (call before commit)
+# ---------------------------------------------------------
+def on_user_registered(db):
+    """Call with the new user's session (user_session), after the user is committed."""
+    bump(db, "users_total", "all")
+
+
+def on_profile_saved(db, old_buckets, new_buckets):
+    for metric in PROFILE_METRICS:
+        old = old_buckets.get(metric)
+        new = new_buckets.get(metric)
+        if old == new:
+            continue
+        if old is not None:
+            bump(db, metric, old, -1)
+        if new is not None:
+            bump(db, metric, new, 1)
+
+
+def on_plan_generated(db, day=None):
+    bump(db, "plans_total", "all")
+    bump(db, "plans_by_day", (day or date.today()).isoformat())
+
+
+def on_weekly_rate_changed(db, goal, old_rate, new_rate):
+    """Keep per-goal sum / count of users' weekly rates in step (None = no stats)."""
+    if not goal:
+        return
+    if old_rate is None and new_rate is None:
+        return
+    if old_rate is None:
+        bump(db, "weekly_rate_users", goal, 1)
+    if new_rate is None:
+        bump(db, "weekly_rate_users", goal, -1)
+    bump(db, "weekly_rate_sum", goal, (new_rate or 0.0) - (old_rate or 0.0))
+
+
+# ---------------------------------------------------------
+# Reconcile + read
+# ---------------------------------------------------------
+def _shard_counts(sdb, counts):
+    """Add one shard's per-user aggregates into `counts`."""
+
+    def add(key, n):
+        counts[key] = counts.get(key, 0) + (n or 0)
+
+    add(("plans_total", "all"), sdb.query(func.count(Plan.id)).scalar())
+
+    for metric in ("goal", "activity_level", "experience_level"):
+        column = getattr(UserProfile, metric)
+        for bucket, n in sdb.query(column, func.count(UserProfile.id)).group_by(column):
+            add((metric, bucket or "beginner"), n)
+
+    # banded in Python with the same BMI as the write hooks (one row per
+    # distinct weight / height pair)
+    body = (UserProfile.weight_kg, UserProfile.height_cm)
+    for weight, height, n in sdb.query(*body, func.count(UserProfile.id)).group_by(*body):
+        add(("bmi_band", bmi_band(_calc_bmi(weight, height))), n)
+
+    rate_rows = (
+        sdb.query(UserProfile.goal, func.sum(ProgressStats.weekly_rate), func.count(ProgressStats.id))
+        .join(ProgressStats, ProgressStats.user_id == UserProfile.user_id)
+        .filter(ProgressStats.entries > 0)
+        .group_by(UserProfile.goal)
+    )
+    for goal, rate_sum, n in rate_rows:
+        add(("weekly_rate_sum", goal), rate_sum)
+        add(("weekly_rate_users", goal), n)
+
+
+def _users_per_shard(db):
+    """{shard: number of users} from the users directory (None = unsharded)."""
+    counts = {}
+    for (user_id,) in db.query(User.id).yield_per(5000):
+        shard = shard_for(user_id) if shard_engines else None
+        counts[shard] = counts.get(shard, 0) + 1
+    return counts
+
+
+def reconcile(db):
+    """
+    Rebuild the reconciled counters from the raw tables, one shard at a
+    time. Each shard's write lock is taken before counting, so a bump
+    can't land between the GROUP BYs and the rewrite and be overwritten.
+    """
+    now = time.time()
+
+    for sdb in shard_sessions():
+        try:
+            sdb.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            # read under the lock too: unsharded, the users table is in this file
+            users = _users_per_shard(db)
+            counts = {
+                ("users_total", "all"): users.get(sdb.info.get("shard"), 0),
+                ("plans_total", "all"): 0,
+            }
+            _shard_counts(sdb, counts)
+
+            sdb.query(AnalyticsCounter).filter(
+                AnalyticsCounter.metric.in_(RECONCILED_METRICS)
+            ).delete(synchronize_session=False)
+            sdb.add_all(
+                AnalyticsCounter(metric=metric, bucket=bucket, value=value)
+                for (metric, bucket), value in counts.items()
+            )
+
+            sdb.query(AnalyticsCounter).filter_by(metric="meta", bucket="reconciled_at").delete()
+            sdb.add(AnalyticsCounter(metric="meta", bucket="reconciled_at", value=now))
+            sdb.commit()
+        finally:
+            sdb.close()
+
+
+def cohort_snapshot(days=PLANS_BY_DAY_WINDOW):
+    """All admin aggregates, read from the counters table only (summed over shards)."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+
+    metrics = {}
+    reconciled = []
+    for sdb in shard_sessions():
+        try:
+            rows = sdb.query(
+                AnalyticsCounter.metric, AnalyticsCounter.bucket, AnalyticsCounter.value
+            ).filter(
+                (AnalyticsCounter.metric != "plans_by_day") | (AnalyticsCounter.bucket >= since)
+            )
+            for metric, bucket, value in rows:
+                if metric == "meta":
+                    if bucket == "reconciled_at":
+                        reconciled.append(value)
+                    continue
+                buckets = metrics.setdefault(metric, {})
+                buckets[bucket] = buckets.get(bucket, 0) + value
+        finally:
+            sdb.close()
+
+    rate_sum = metrics.get("weekly_rate_sum", {})
+    rate_users = metrics.get("weekly_rate_users", {})
+    avg_weekly_rate = {
+        goal: round(rate_sum.get(goal, 0.0) / n, 2)
+        for goal, n in rate_users.items()
+        if n > 0
+    }
+
+    # a shard that was never reconciled means the whole view wasn't
+    reconciled_at = min(reconciled) if len(reconciled) == len(shard_engines or [None]) else None
+
+    def counts(metric):
+        return {k: int(v) for k, v in sorted(metrics.get(metric, {}).items()) if v > 0}
+
+    return {
+        "users_total": int(metrics.get("users_total", {}).get("all", 0)),
+        "plans_total": int(metrics.get("plans_total", {}).get("all", 0)),
+        "bmi_band": counts("bmi_band"),
+        "goal": counts("goal"),
+        "activity_level": counts("activity_level"),
+        "experience_level": counts("experience_level"),
+        "avg_weekly_rate": avg_weekly_rate,
+        "plans_by_day": sorted(counts("plans_by_day").items()),
+        "reconciled_at": (
+            datetime.fromtimestamp(reconciled_at).strftime("%Y-%m-%d %H:%M") if reconciled_at else None
+        ),
+    }
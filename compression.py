@@ -0,0 +1,202 @@
+# compression.py
+"""
+WSGI response compression for FitAI Planner.
+
+Negotiates brotli (if the `brotli` package is installed) or gzip from
+the request's Accept-Encoding header. Only responses whose content type
+is in the allowlist and that are at least `min_size` bytes get
+compressed. Responses with a known length are compressed in one go.
+Streamed responses (no Content-Length) are compressed chunk by chunk and
+flushed after each chunk, so data still reaches the client as it is
+produced.
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "application/manifest+json",
+    "image/svg+xml",
+)
+
+DEFAULT_LEVEL = 6
+DEFAULT_MIN_SIZE = 500
+
+
+def _accepted_encodings(header):
+    """{encoding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def _weak_etags(headers):
+    """
+    Mark a strong ETag weak: the compressed body is not byte-for-byte the
+    representation it was computed for. If-None-Match uses the weak
+    comparison, so revalidation still gets a 304.
+    """
+    return [
+        (k, "W/" + v if k.lower() == "etag" and not v.startswith("W/") else v)
+        for k, v in headers
+    ]
+
+
+class GzipStream:
+    """Incremental gzip: compress() per chunk, flush() to sync, finish() to close."""
+
+    def __init__(self, level=DEFAULT_LEVEL):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 → gzip container
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._c.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        # brotli quality runs 0–11; level 6 → quality 5, a good speed /
+        # size balance for dynamic responses
+        self._c = brotli.Compressor(quality=min(11, max(0, level - 1)))
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE, mimetypes=DEFAULT_MIMETYPES):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+
+    def _negotiate(self, environ):
+        accepted = _accepted_encodings(environ.get("HTTP_ACCEPT_ENCODING"))
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def _compressor(self, encoding):
+        if encoding == "br":
+            return _BrotliStream(self.level)
+        return GzipStream(self.level)
+
+    def _should_compress(self, environ, status, headers):
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return False
+        code = int(status.split(" ", 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+
+        lookup = {k.lower(): v for k, v in headers}
+        if "content-encoding" in lookup:
+            return False
+        mimetype = lookup.get("content-type", "").split(";", 1)[0].strip().lower()
+        if mimetype not in self.mimetypes:
+            return False
+        length = lookup.get("content-length")
+        if length is not None and int(length) < self.min_size:
+            return False
+        return True
+
+    def __call__(self, environ, start_response):
+        encoding = self._negotiate(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        captured = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return lambda data: None  # legacy write() is not supported
+
+        body = self.app(environ, capture_start_response)
+        return self._respond(environ, start_response, encoding, captured, body)
+
+    def _respond(self, environ, start_response, encoding, captured, body):
+        iterator = iter(body)
+        try:
+            # some apps only call start_response once iteration begins
+            first = b""
+            if not captured:
+                first = next(iterator, b"")
+            status, headers, exc_info = captured
+
+            if not self._should_compress(environ, status, headers):
+                if status.startswith("304"):
+                    # same validator as the compressed 200 it stands in for
+                    headers = _weak_etags(headers)
+                start_response(status, headers, exc_info)
+                if first:
+                    yield first
+                yield from iterator
+                return
+
+            known_length = any(k.lower() == "content-length" for k, _ in headers)
+            headers = [
+                (k, v) for k, v in headers
+                if k.lower() not in ("content-length", "content-encoding")
+            ]
+            vary = [v for k, v in headers if k.lower() == "vary"]
+            headers = [(k, v) for k, v in headers if k.lower() != "vary"]
+            headers.append(("Vary", ", ".join(vary + ["Accept-Encoding"])))
+            headers.append(("Content-Encoding", encoding))
+            headers = _weak_etags(headers)
+
+            compressor = self._compressor(encoding)
+
+            if known_length:
+                # buffered response: compress once and send an exact length
+                data = compressor.compress(first + b"".join(iterator)) + compressor.finish()
+                headers.append(("Content-Length", str(len(data))))
+                start_response(status, headers, exc_info)
+                yield data
+                return
+
+            start_response(status, headers, exc_info)
+            if first:
+                yield compressor.compress(first) + compressor.flush()
+            for chunk in iterator:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            if hasattr(body, "close"):
+                body.close()
@@ -1,17 +1,98 @@
 # database.py
+import os
+import zlib
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 # SQLite DB in the project folder
 SQLALCHEMY_DATABASE_URL = "sqlite:///fitness_ai.db"
 # if you prefer the old name, you can change to: "sqlite:///fitnessai.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # needed for SQLite + threads
+# Optional sharding: with FITAI_SHARDS=N (N > 0) the per-user tables live in
+# N extra SQLite files picked by a hash of user_id, so writes for different
+# users don't queue behind one file lock. fitness_ai.db stays the global
+# directory (users). 0 = everything in fitness_ai.db.
+SHARD_COUNT = int(os.environ.get("FITAI_SHARDS", "0"))
+SHARD_URL_TEMPLATE = "sqlite:///fitness_ai_shard{}.db"
+
+# tables partitioned by user_id when sharding is on; analytics_counters has
+# no user_id but is split too (each shard counts its own users, admin reads
+# sum them) so per-user writes never touch fitness_ai.db
+SHARDED_TABLES = frozenset(
+    {"user_profiles", "plans", "progress", "progress_stats", "chat_messages", "analytics_counters"}
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def make_engine(url):
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False}  # needed for SQLite + threads
+    )
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+shard_engines = [make_engine(SHARD_URL_TEMPLATE.format(i)) for i in range(SHARD_COUNT)]
+
+
+def shard_for(user_id, shard_count=None):
+    """Shard index for a user (stable across processes and restarts)."""
+    shard_count = SHARD_COUNT if shard_count is None else shard_count
+    return zlib.crc32(str(int(user_id)).encode("ascii")) % shard_count
+
+
+class RoutingSession(Session):
+    """
+    Sends per-user tables to the shard in `session.info` ("user_id" or
+    "shard") and everything else to the directory database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if shard_engines and mapper is not None and mapper.persist_selectable.name in SHARDED_TABLES:
+            if "shard" in self.info:
+                return shard_engines[self.info["shard"]]
+            if "user_id" in self.info:
+                return shard_engines[shard_for(self.info["user_id"])]
+            raise RuntimeError(
+                "Sharded table queried without a user: use user_session() or shard_sessions()."
+            )
+        return engine
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+
+def user_session(user_id):
+    """Session for one user's data (routes to their shard when sharding is on)."""
+    db = SessionLocal()
+    db.info["user_id"] = user_id
+    return db
+
+
+def shard_session(shard):
+    """Session pinned to one shard (None = the single database)."""
+    db = SessionLocal()
+    if shard is not None:
+        db.info["shard"] = shard
+    return db
+
+
+def group_by_shard(user_ids):
+    """{shard: [user_id, ...]}; a single None group when sharding is off."""
+    if not shard_engines:
+        return {None: list(user_ids)}
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_for(user_id), []).append(user_id)
+    return groups
+
+
+def shard_sessions():
+    """One session per shard, for admin queries across all users."""
+    if not shard_engines:
+        return [shard_session(None)]
+    return [shard_session(i) for i in range(len(shard_engines))]
+
 
 # This is what models.py imports
 Base = declarative_base()
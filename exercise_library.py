@@ -0,0 +1,223 @@
+# exercise_library.py
+"""
+Exercise library for FitAI Planner.
+
+Exercises live in data/exercises.csv and are loaded once into an
+inverted index (muscle / equipment / modality / difficulty → exercise ids).
+Queries intersect the matching id sets, smallest first, so lookups stay
+well under a millisecond. Used to compose workout splits, to suggest
+exercises in the coach and to validate custom workouts.
+"""
+
+import csv
+import os
+import re
+from functools import lru_cache
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "exercises.csv")
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+
+INDEX_FIELDS = ("muscle", "equipment", "modality", "difficulty")
+
+# everyday words → muscle groups used in the data file
+MUSCLE_ALIASES = {
+    "legs": ("quads", "hamstrings", "glutes", "calves"),
+    "arms": ("biceps", "triceps", "forearms"),
+    "abs": ("core",),
+    "full body": ("full_body",),
+    "mobility": ("hips", "spine", "ankles"),
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# muscles that are also everyday words ("get back on track"): they only
+# count in text that is about training
+_EVERYDAY_MUSCLES = frozenset({"back"})
+_TRAINING_WORDS = frozenset({
+    "exercise", "exercises", "workout", "workouts", "train", "training",
+    "muscle", "muscles", "day", "lift", "lifts", "lifting", "strength",
+    "stretch", "stretches", "moves",
+})
+
+
+def _tokens(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2]
+
+
+def allowed_difficulties(level):
+    """Difficulties a trainee at `level` may be given (their level and below)."""
+    level = (level or "beginner").lower()
+    if level not in DIFFICULTY_LEVELS:
+        level = "beginner"
+    return DIFFICULTY_LEVELS[: DIFFICULTY_LEVELS.index(level) + 1]
+
+
+class ExerciseLibrary:
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self._all = frozenset(range(len(exercises)))
+
+        index = {field: {} for field in INDEX_FIELDS}
+        name_index = {}
+        for i, ex in enumerate(exercises):
+            for muscle in ex["muscles"]:
+                index["muscle"].setdefault(muscle, set()).add(i)
+            for equipment in ex["equipment"]:
+                index["equipment"].setdefault(equipment, set()).add(i)
+            index["modality"].setdefault(ex["modality"], set()).add(i)
+            index["difficulty"].setdefault(ex["difficulty"], set()).add(i)
+            for token in _tokens(ex["name"]):
+                name_index.setdefault(token, set()).add(i)
+
+        self._index = {
+            field: {key: frozenset(ids) for key, ids in values.items()}
+            for field, values in index.items()
+        }
+        self._name_index = {key: frozenset(ids) for key, ids in name_index.items()}
+        self._by_name = {ex["name"].lower(): i for i, ex in enumerate(exercises)}
+
+    def __len__(self):
+        return len(self.exercises)
+
+    def values(self, field):
+        return sorted(self._index[field])
+
+    def muscles_in(self, text):
+        """Muscles, then aliases, named in free text; whole words only ("abs" is not "absolutely")."""
+        tokens = _tokens(text)
+        words = f" {' '.join(tokens)} "
+        training = not _TRAINING_WORDS.isdisjoint(tokens)
+        found = [
+            m for m in self.values("muscle")
+            if f" {m.replace('_', ' ')} " in words and (training or m not in _EVERYDAY_MUSCLES)
+        ]
+        found += [
+            alias for alias in MUSCLE_ALIASES
+            if f" {alias} " in words and alias.replace(" ", "_") not in found
+        ]
+        return found
+
+    def _ids_for(self, field, value):
+        """Ids matching one value, a collection of values (OR), or a muscle alias."""
+        if isinstance(value, str):
+            value = value.strip().lower()
+            if field == "muscle" and value in MUSCLE_ALIASES:
+                value = (value,) + MUSCLE_ALIASES[value]
+            else:
+                return self._index[field].get(value, frozenset())
+
+        ids = set()
+        for v in value:
+            ids |= self._index[field].get(v, frozenset())
+        return ids
+
+    def ids(self, muscle=None, equipment=None, modality=None, difficulty=None):
+        """Exercise ids matching every given filter, in library order."""
+        wanted = {
+            "muscle": muscle,
+            "equipment": equipment,
+            "modality": modality,
+            "difficulty": difficulty,
+        }
+        sets = [self._ids_for(f, v) for f, v in wanted.items() if v]
+        if not sets:
+            return sorted(self._all)
+
+        sets.sort(key=len)
+        result = set(sets[0])
+        for s in sets[1:]:
+            if not result:
+                break
+            result &= s
+        return sorted(result)
+
+    def search(self, muscle=None, equipment=None, modality=None, level=None, q=None, limit=20):
+        """
+        Exercises matching the filters. `level` keeps exercises at or below
+        that experience level; `q` matches words in the exercise name.
+        """
+        difficulty = allowed_difficulties(level) if level else None
+        ids = self.ids(muscle, equipment, modality, difficulty)
+
+        if q:
+            for token in _tokens(q):
+                matches = self._name_index.get(token, frozenset())
+                ids = [i for i in ids if i in matches]
+
+        return [self.exercises[i] for i in ids[:limit]]
+
+    def get(self, name):
+        i = self._by_name.get((name or "").strip().lower())
+        return None if i is None else self.exercises[i]
+
+    def pick(self, muscles, modality, level, count=3, equipment=None, used=None):
+        """
+        Pick `count` exercise names for a training day, cycling through
+        `muscles` so each group gets work. Exercises at the trainee's own
+        level come first; names already in `used` are only reused if the
+        library runs out.
+        """
+        used = used if used is not None else set()
+        allowed = allowed_difficulties(level)
+
+        per_muscle = []
+        for muscle in muscles:
+            ids = self.ids(muscle, equipment, modality, allowed)
+            # hardest allowed first, library order within a difficulty
+            ids.sort(key=lambda i: -DIFFICULTY_LEVELS.index(self.exercises[i]["difficulty"]))
+            per_muscle.append(ids)
+
+        chosen = []
+        for allow_reuse in (False, True):
+            progress = True
+            while len(chosen) < count and progress:
+                progress = False
+                for ids in per_muscle:
+                    for i in ids:
+                        name = self.exercises[i]["name"]
+                        if name in chosen or (name in used and not allow_reuse):
+                            continue
+                        chosen.append(name)
+                        progress = True
+                        break
+                    if len(chosen) >= count:
+                        break
+
+        used.update(chosen)
+        return chosen
+
+    def find_in_text(self, text):
+        """Names of library exercises mentioned in free text (e.g. a custom workout day)."""
+        lowered = (text or "").lower()
+        candidates = set()
+        for token in _tokens(lowered):
+            candidates |= self._name_index.get(token, frozenset())
+        found = [
+            self.exercises[i]["name"]
+            for i in sorted(candidates)
+            if self.exercises[i]["name"].lower() in lowered
+        ]
+        return found
+
+
+def _read_library(path):
+    exercises = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            exercises.append(
+                {
+                    "name": row["name"].strip(),
+                    "muscles": tuple(m.strip() for m in row["muscles"].split("|")),
+                    "equipment": tuple(e.strip() for e in row["equipment"].split("|")),
+                    "modality": row["modality"].strip(),
+                    "difficulty": row["difficulty"].strip(),
+                }
+            )
+    return ExerciseLibrary(exercises)
+
+
+@lru_cache(maxsize=1)
+def exercise_library(path=LIBRARY_PATH):
+    """Load the exercise library once per process."""
+    return _read_library(path)
@@ -0,0 +1,254 @@
+# meal_planner.py
+"""
+Macro-matching meal planner for FitAI Planner.
+
+The food catalogue (data/foods.csv) is read once into NumPy arrays and
+indexed by diet type + meal slot + role. Breakfast, lunch and dinner are
+one staple, one protein dish and one side; a snack is a single food.
+Each meal is picked by scoring every combination of candidate foods (one
+per role) and portion sizes in a single vectorized pass, so a daily plan
+takes a few milliseconds even for a large catalogue.
+
+Diets: "veg" uses veg foods only, "nonveg" takes its protein dishes from
+the non-veg foods (staples and sides can be veg), "mixed" uses anything.
+
+Daily plans only depend on (diet_type, goal, calories, protein, fibre),
+so they are cached and shared between users with the same targets.
+"""
+
+import csv
+import os
+from functools import lru_cache, reduce
+
+import numpy as np
+
+CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "foods.csv")
+
+MEAL_SLOTS = ("breakfast", "lunch", "dinner", "snacks")
+
+# share of the daily calories / protein / fibre each meal should cover
+_SLOT_SHARE = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snacks": 0.10}
+
+ROLES = ("staple", "protein", "side")
+
+# roles that make up each meal (None: one food of any role)
+_SLOT_ROLES = {
+    "breakfast": ROLES,
+    "lunch": ROLES,
+    "dinner": ROLES,
+    "snacks": (None,),
+}
+
+# serving multipliers the optimizer may choose from
+PORTIONS = np.array([0.5, 1.0, 1.5, 2.0], dtype=np.float32)
+
+# foods kept per role after pre-filtering (keeps the combined search small)
+_MAX_CANDIDATES = 48
+_MAX_CANDIDATES_PER_ROLE = 16
+
+
+class FoodCatalogue:
+    """Column-oriented food table plus an index of row ids per (diet, slot, role)."""
+
+    def __init__(self, names, qty, units, kcal, protein, fibre, index):
+        self.names = names
+        self.qty = qty
+        self.units = units
+        self.kcal = kcal
+        self.protein = protein
+        self.fibre = fibre
+        self._index = index
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, diet_type, slot, role=None):
+        return self._index.get((diet_type, slot, role), np.empty(0, dtype=np.int32))
+
+
+def _diets_for(diet, role):
+    """Diet types a food may appear in."""
+    if diet == "nonveg":
+        return ("nonveg", "mixed")
+    # a non-veg plan still eats rice, roti, salad...; only its protein is non-veg
+    return ("veg", "mixed") if role == "protein" else ("veg", "nonveg", "mixed")
+
+
+def _read_catalogue(path):
+    names, qty, units = [], [], []
+    kcal, protein, fibre = [], [], []
+    rows_by_key = {}
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            names.append(row["name"])
+            qty.append(float(row["qty"]))
+            units.append(row["unit"])
+            kcal.append(float(row["kcal"]))
+            protein.append(float(row["protein_g"]))
+            fibre.append(float(row["fibre_g"]))
+
+            role = row["role"].strip().lower()
+            if role not in ROLES:
+                raise ValueError(f"{path}: unknown role {role!r} for {row['name']!r}")
+            for slot in row["meals"].split("|"):
+                for d in _diets_for(row["diet"].strip().lower(), role):
+                    rows_by_key.setdefault((d, slot.strip(), role), []).append(i)
+                    rows_by_key.setdefault((d, slot.strip(), None), []).append(i)
+
+    index = {key: np.array(ids, dtype=np.int32) for key, ids in rows_by_key.items()}
+    return FoodCatalogue(
+        names,
+        np.array(qty, dtype=np.float32),
+        units,
+        np.array(kcal, dtype=np.float32),
+        np.array(protein, dtype=np.float32),
+        np.array(fibre, dtype=np.float32),
+        index,
+    )
+
+
+@lru_cache(maxsize=1)
+def load_catalogue(path=CATALOGUE_PATH):
+    """Load the food catalogue once per process."""
+    return _read_catalogue(path)
+
+
+def protein_target(goal, weight_kg):
+    # grams of protein per kg body weight
+    per_kg = {"lose": 2.0, "gain": 1.8}.get((goal or "").lower(), 1.4)
+    return int(round(per_kg * weight_kg))
+
+
+def fibre_target(calories):
+    # ~14 g per 1000 kcal
+    return int(round(calories * 14 / 1000))
+
+
+def _prefilter(cat, idx, kcal_t, protein_t, fibre_t, n_items, keep=_MAX_CANDIDATES):
+    """Keep the most promising foods for a slot by nutrient density + portion fit."""
+    if len(idx) <= keep:
+        return idx
+
+    # zero-calorie foods and zero targets would divide by zero
+    kcal = np.maximum(cat.kcal[idx], 1.0)
+    kcal_t = max(kcal_t, 1.0)
+
+    def density(values, target):
+        if target <= 0:
+            return np.full(len(idx), 1.5, dtype=np.float32)  # nothing to cover
+        return np.minimum((values / kcal) / (target / kcal_t), 1.5)
+
+    size_fit = np.abs(np.log(kcal * n_items / kcal_t))
+    score = density(cat.protein[idx], protein_t) + density(cat.fibre[idx], fibre_t) - size_fit
+    top = np.argpartition(-score, keep)[:keep]
+    return idx[top]
+
+
+def _shortfall(target, total):
+    # relative amount missing; 0 when the target is already met (or is 0)
+    return np.maximum(target - total, 0) / max(target, 1e-6)
+
+
+def _pick_meal(cat, groups, kcal_t, protein_t, fibre_t):
+    """
+    One food per group (candidate row ids per role) plus a portion each,
+    as [(row, portion), ...] whose totals best match the slot targets.
+    Calories are matched both ways; protein and fibre only count when short.
+    """
+    n_items = len(groups)
+    keep = _MAX_CANDIDATES if n_items == 1 else _MAX_CANDIDATES_PER_ROLE
+
+    options = []
+    for idx in groups:
+        idx = _prefilter(cat, idx, kcal_t, protein_t, fibre_t, n_items, keep)
+        # one option per (food, portion)
+        food = np.repeat(idx, len(PORTIONS))
+        portion = np.tile(PORTIONS, len(idx))
+        options.append((food, portion))
+
+    def total(column):
+        # n-dimensional grid: axis r = options of group r
+        return reduce(np.add.outer, [column[food] * portion for food, portion in options])
+
+    tot_k, tot_p, tot_f = total(cat.kcal), total(cat.protein), total(cat.fibre)
+
+    score = (
+        ((tot_k - kcal_t) / max(kcal_t, 1.0)) ** 2
+        + 0.5 * _shortfall(protein_t, tot_p) ** 2
+        + 0.25 * _shortfall(fibre_t, tot_f) ** 2
+    )
+
+    best = np.unravel_index(int(np.argmin(score)), score.shape)
+    return [
+        (int(food[i]), float(portion[i]))
+        for (food, portion), i in zip(options, best)
+    ]
+
+
+def _describe(cat, items):
+    return " + ".join(
+        f"{cat.names[row]} ({cat.qty[row] * portion:g} {cat.units[row]})"
+        for row, portion in items
+    )
+
+
+@lru_cache(maxsize=2048)
+def _plan_day(diet_type, calories, protein_g, fibre_g):
+    cat = load_catalogue()
+    used = set()
+    meals = {}
+    totals = np.zeros(3, dtype=np.float64)
+
+    for slot in MEAL_SLOTS:
+        share = _SLOT_SHARE[slot]
+        groups = []
+        for role in _SLOT_ROLES[slot]:
+            idx = cat.candidates(diet_type, slot, role)
+            if used:
+                idx = idx[~np.isin(idx, list(used))]
+            if len(idx):
+                groups.append(idx)
+        if not groups:
+            meals[slot] = ""
+            continue
+
+        items = _pick_meal(cat, groups, calories * share, protein_g * share, fibre_g * share)
+        used.update(row for row, _ in items)
+        meals[slot] = _describe(cat, items)
+        for row, portion in items:
+            totals += portion * np.array(
+                [cat.kcal[row], cat.protein[row], cat.fibre[row]], dtype=np.float64
+            )
+
+    # plain Python types: plans are stored with str() and read with literal_eval
+    meals["totals"] = {
+        "kcal": int(round(totals[0])),
+        "protein_g": int(round(totals[1])),
+        "fibre_g": int(round(totals[2])),
+    }
+    return meals
+
+
+def build_meal_plan(diet_type, goal, calories_target, weight_kg):
+    """
+    Daily meals for the given targets. Returns a dict with one description
+    string per meal slot plus the protein / fibre targets and achieved totals.
+    """
+    diet_type = diet_type if diet_type in ("veg", "nonveg") else "mixed"
+    protein_g = protein_target(goal, weight_kg)
+    fibre_g = fibre_target(calories_target)
+
+    # round targets so near-identical users share a cached plan
+    meals = _plan_day(
+        diet_type,
+        int(round(calories_target / 25.0)) * 25,
+        int(round(protein_g / 5.0)) * 5,
+        fibre_g,
+    )
+
+    plan = {slot: meals[slot] for slot in MEAL_SLOTS}
+    plan["protein_target_g"] = protein_g
+    plan["fibre_target_g"] = fibre_g
+    plan["totals"] = dict(meals["totals"])
+    return plan
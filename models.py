@@ -1,8 +1,8 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
-from database import Base, engine
+from database import Base, SHARDED_TABLES, engine, shard_engines
 
 
 class User(Base):
@@ -67,6 +67,58 @@ class Progress(Base):
     user = relationship("User", back_populates="progress")
 
 
+class ProgressStats(Base):
+    """Running trend state per user, kept up to date on each check-in."""
+
+    __tablename__ = "progress_stats"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
+
+    entries = Column(Integer, nullable=False, default=0)
+    first_day = Column(Integer)
+    first_weight = Column(Float)
+    last_day = Column(Integer)
+    last_weight = Column(Float)
+
+    ema_weight = Column(Float)          # smoothed weight (kg)
+    weekly_rate = Column(Float)         # smoothed change (kg / week)
+    plateau_since_day = Column(Integer)  # first day of the current flat stretch
+
+
+class ChatMessage(Base):
+    """One trainer chat turn; rows are only ever appended."""
+
+    __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_user_id_id", "user_id", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    role = Column(String(4), nullable=False)    # "user" / "bot"
+    text = Column(String, nullable=False)
+    created_at = Column(Integer, nullable=False)  # unix seconds
+
+
+class AnalyticsCounter(Base):
+    """Pre-aggregated admin metric, e.g. ("goal", "lose") -> number of users."""
+
+    __tablename__ = "analytics_counters"
+    __table_args__ = (UniqueConstraint("metric", "bucket"),)
+
+    id = Column(Integer, primary_key=True)
+    metric = Column(String, nullable=False)
+    bucket = Column(String, nullable=False)
+    value = Column(Float, nullable=False, default=0)
+
+
 def init_db():
-    """Create all tables."""
-    Base.metadata.create_all(bind=engine)
+    """Create all tables (per-user tables go to every shard when sharding is on)."""
+    if not shard_engines:
+        Base.metadata.create_all(bind=engine)
+        return
+
+    tables = Base.metadata.sorted_tables
+    Base.metadata.create_all(bind=engine, tables=[t for t in tables if t.name not in SHARDED_TABLES])
+    for shard in shard_engines:
+        Base.metadata.create_all(bind=shard, tables=[t for t in tables if t.name in SHARDED_TABLES])
@@ -0,0 +1,304 @@
+# plan_pdf.py
+"""
+PDF rendering for FitAI plans.
+
+`plan_page` resolves a stored plan into exactly what gets drawn (the
+program week is looked up, so its real workouts and note are included).
+`render_plan_pdf` draws such a page; it only takes plain values, so it can
+run in worker processes for batch exports. Rendered PDFs are cached on
+disk, keyed by a hash of the resolved page, so unchanged pages are never
+drawn twice and changes to the exercise data or the program generator
+show up without a cache flush. The cache is pruned least recently used
+first once it outgrows PDF_CACHE_MAX_BYTES, and entries unused for
+PDF_CACHE_MAX_AGE seconds are dropped.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import time
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from ai_engine import get_program_week
+
+PDF_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_cache")
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PDF_CACHE_MAX_AGE = 30 * 24 * 3600
+
+# prune after this many bytes were written by this process (and on its first write)
+_PRUNE_EVERY_BYTES = PDF_CACHE_MAX_BYTES // 16
+_written_since_prune = _PRUNE_EVERY_BYTES
+
+# bump when the drawing code changes so cached PDFs are redrawn
+LAYOUT_VERSION = 2
+
+DIET_FIELDS = ("focus", "breakfast", "lunch", "dinner", "snacks")
+
+
+def plan_page(user_name, bmi, bmr, calories_target, diet_plan_str, workout_plan_str, week_no=1):
+    """Everything the PDF shows, as plain values, with the program week resolved."""
+    diet_plan = ast.literal_eval(diet_plan_str)
+    workout_plan = ast.literal_eval(workout_plan_str)
+    program_week = get_program_week(workout_plan, week_no)
+
+    page = {
+        "user_name": user_name,
+        "bmi": bmi,
+        "bmr": bmr,
+        "calories_target": calories_target,
+        "diet": {field: diet_plan.get(field, "") for field in DIET_FIELDS},
+        "level": workout_plan.get("level", ""),
+        "workouts": list(workout_plan.get("workouts", [])),
+        "week": None,
+    }
+    if program_week:
+        page["workouts"] = list(program_week["workouts"])
+        total = workout_plan.get("program_weeks")
+        page["week"] = {
+            "number": program_week["week"],
+            "of": total if total and program_week["week"] <= total else None,
+            "note": program_week["note"],
+        }
+    return page
+
+
+def render_plan_pdf(page):
+    """Draw a plan_page() and return the PDF bytes."""
+    user_name = page["user_name"]
+    bmi, bmr, calories_target = page["bmi"], page["bmr"], page["calories_target"]
+    diet_plan = page["diet"]
+    program_week = page["week"]
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    margin_x = 25 * mm
+    margin_y = 25 * mm
+    header_height = 32
+    y = height - margin_y
+
+    # HEADER BAR
+    c.setFillColorRGB(0.09, 0.20, 0.45)
+    c.rect(0, height - header_height - 10, width, header_height + 10, stroke=0, fill=1)
+    c.setFillColorRGB(0.15, 0.40, 0.90)
+    c.rect(0, height - header_height, width, header_height, stroke=0, fill=1)
+
+    logo_radius = 9
+    logo_cx = margin_x
+    logo_cy = height - header_height / 2 - 5
+
+    c.setFillColor(colors.white)
+    c.circle(logo_cx, logo_cy, logo_radius, stroke=0, fill=1)
+
+    c.setFillColorRGB(0.11, 0.27, 0.65)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawCentredString(logo_cx, logo_cy - 3, "F")
+
+    text_x = logo_cx + 2 * logo_radius + 6
+    text_y = logo_cy + 2
+
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 15)
+    c.drawString(text_x, text_y, "FitAI Planner")
+
+    c.setFont("Helvetica", 8.5)
+    c.setFillColorRGB(0.88, 0.94, 1)
+    c.drawString(text_x, text_y - 12, "Smart Fitness & Diet Assistant")
+
+    title = "Personalised Fitness & Diet Plan"
+    c.setFont("Helvetica-Bold", 11)
+    c.setFillColor(colors.white)
+    c.drawCentredString(width / 2, height - header_height + 4, title)
+
+    y = height - header_height - 20
+
+    # USER SUMMARY
+    c.setFont("Helvetica-Bold", 11)
+    c.setFillColor(colors.black)
+    c.drawString(margin_x, y, f"👤  User: {user_name}")
+    y -= 16
+
+    c.setFont("Helvetica", 9.5)
+    c.drawString(margin_x, y, f"BMI: {bmi}     BMR: {bmr} kcal/day")
+    y -= 13
+    c.drawString(margin_x, y, f"Target Calories: {calories_target} kcal/day")
+    y -= 18
+
+    c.setStrokeColorRGB(0.8, 0.85, 0.9)
+    c.line(margin_x, y, width - margin_x, y)
+    y -= 18
+
+    # DIET PLAN
+    c.setFont("Helvetica-Bold", 11.5)
+    c.setFillColorRGB(0.11, 0.27, 0.65)
+    c.drawString(margin_x, y, "🍽  Diet Plan")
+    y -= 14
+
+    c.setFont("Helvetica", 9)
+    c.setFillColor(colors.black)
+    focus = diet_plan.get("focus", "")
+    c.drawString(margin_x, y, focus[:110])
+    y -= 18
+
+    box_height = 72
+    c.setStrokeColorRGB(0.82, 0.86, 0.94)
+    c.setFillColorRGB(0.97, 0.98, 1)
+    c.roundRect(
+        margin_x,
+        y - box_height,
+        width - 2 * margin_x,
+        box_height,
+        6,
+        stroke=1,
+        fill=1,
+    )
+
+    row_y = y - 12
+
+    def diet_row(label, value):
+        nonlocal row_y
+        c.setFont("Helvetica-Bold", 9)
+        c.setFillColorRGB(0.12, 0.16, 0.26)
+        c.drawString(margin_x + 6, row_y, label)
+        c.setFont("Helvetica", 9)
+        c.setFillColor(colors.black)
+        c.drawString(margin_x + 70, row_y, (value or "")[:80])
+        row_y -= 14
+
+    diet_row("Breakfast:", diet_plan.get("breakfast", ""))
+    diet_row("Lunch:", diet_plan.get("lunch", ""))
+    diet_row("Dinner:", diet_plan.get("dinner", ""))
+    diet_row("Snacks:", diet_plan.get("snacks", ""))
+
+    y = y - box_height - 26
+
+    # WORKOUT PLAN
+    if y < margin_y + 80:
+        c.showPage()
+        y = height - margin_y
+
+    c.setFont("Helvetica-Bold", 11.5)
+    c.setFillColorRGB(0.11, 0.27, 0.65)
+    c.drawString(margin_x, y, "🏋️  Workout Plan")
+    y -= 14
+
+    c.setFont("Helvetica", 9)
+    c.setFillColor(colors.black)
+    c.drawString(margin_x, y, page["level"])
+    y -= 16
+
+    if program_week:
+        c.setFont("Helvetica-Bold", 9)
+        title = f"Week {program_week['number']}"
+        if program_week["of"]:
+            title += f" of {program_week['of']}"
+        c.drawString(margin_x, y, title)
+        c.setFont("Helvetica", 9)
+        c.drawString(margin_x + 70, y, program_week["note"][:90])
+        y -= 16
+
+    workouts = page["workouts"]
+
+    for i, w in enumerate(workouts, start=1):
+        if y < 40:
+            c.showPage()
+            y = height - margin_y
+            c.setFont("Helvetica-Bold", 10.5)
+            c.drawString(margin_x, y, "Workout Plan (continued)")
+            y -= 16
+            c.setFont("Helvetica", 9)
+
+        c.drawString(margin_x, y, f"Day {i}: {w}")
+        y -= 13
+
+    c.setFont("Helvetica-Oblique", 8)
+    c.setFillColorRGB(0.45, 0.5, 0.6)
+    c.drawString(
+        margin_x,
+        18,
+        "Generated by FitAI Planner • This plan is for educational purposes only.",
+    )
+
+    c.showPage()
+    c.save()
+
+    return buffer.getvalue()
+
+
+def pdf_cache_key(page):
+    data = json.dumps([LAYOUT_VERSION, page], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def cached_pdf(key):
+    path = os.path.join(PDF_CACHE_DIR, key + ".pdf")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # mtime doubles as "last used" for pruning
+        return data
+    except OSError:
+        return None
+
+
+def prune_pdf_cache(max_bytes=PDF_CACHE_MAX_BYTES, max_age=PDF_CACHE_MAX_AGE):
+    """Drop expired PDFs, then the least recently used until under max_bytes; returns files removed."""
+    files = []
+    try:
+        with os.scandir(PDF_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # pruned by another process
+                files.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    files.sort()  # least recently used first
+    total = sum(size for _, size, _ in files)
+    oldest_kept = time.time() - max_age
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= oldest_kept and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+
+def store_pdf(key, data):
+    global _written_since_prune
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    path = os.path.join(PDF_CACHE_DIR, key + ".pdf")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+    _written_since_prune += len(data)
+    if _written_since_prune >= _PRUNE_EVERY_BYTES:
+        _written_since_prune = 0
+        prune_pdf_cache()
+
+
+def plan_pdf(user_name, bmi, bmr, calories_target, diet_plan_str, workout_plan_str, week_no=1):
+    """Cached plan PDF for one user and program week."""
+    page = plan_page(user_name, bmi, bmr, calories_target, diet_plan_str, workout_plan_str, week_no)
+    key = pdf_cache_key(page)
+    data = cached_pdf(key)
+    if data is None:
+        data = render_plan_pdf(page)
+        store_pdf(key, data)
+    return data
@@ -0,0 +1,179 @@
+# progress_analytics.py
+"""
+Incremental progress analytics for FitAI Planner.
+
+Each user has one ProgressStats row holding the running trend state:
+an exponential moving average (EMA) of weight, a smoothed weekly rate
+of change and the start of the current plateau. A new check-in after the
+latest day updates that state in O(1); only edits to existing days and
+resets fall back to a full recompute over the user's history.
+"""
+
+from ai_engine import maintenance_calories
+from models import Progress, ProgressStats
+
+# smoothing per day of gap between check-ins
+EMA_ALPHA = 0.3
+RATE_ALPHA = 0.3
+
+# |kg per week| below this counts as "flat"
+PLATEAU_RATE = 0.1
+# flat for this many days → plateau
+PLATEAU_DAYS = 14
+
+# ~7700 kcal per kg of body weight
+KCAL_PER_KG = 7700
+
+
+def _decay(alpha, gap):
+    # same smoothing per day, whether check-ins are daily or weekly
+    return 1 - (1 - alpha) ** max(gap, 1)
+
+
+def _reset(stats):
+    stats.entries = 0
+    stats.first_day = stats.first_weight = None
+    stats.last_day = stats.last_weight = None
+    stats.ema_weight = stats.weekly_rate = None
+    stats.plateau_since_day = None
+
+
+def update_stats(stats, day, weight):
+    """Fold one check-in (with day > stats.last_day) into the running state."""
+    if not stats.entries:
+        stats.entries = 1
+        stats.first_day = stats.last_day = day
+        stats.first_weight = stats.last_weight = weight
+        stats.ema_weight = weight
+        stats.weekly_rate = 0.0
+        stats.plateau_since_day = None
+        return stats
+
+    gap = day - stats.last_day
+    prev_ema = stats.ema_weight
+    stats.ema_weight = prev_ema + _decay(EMA_ALPHA, gap) * (weight - prev_ema)
+
+    instant_rate = (stats.ema_weight - prev_ema) / gap * 7
+    if stats.entries == 1:
+        stats.weekly_rate = instant_rate
+    else:
+        stats.weekly_rate += _decay(RATE_ALPHA, gap) * (instant_rate - stats.weekly_rate)
+
+    if abs(stats.weekly_rate) < PLATEAU_RATE:
+        if stats.plateau_since_day is None:
+            stats.plateau_since_day = stats.last_day
+    else:
+        stats.plateau_since_day = None
+
+    stats.entries += 1
+    stats.last_day = day
+    stats.last_weight = weight
+    return stats
+
+
+def recompute_stats(stats, rows):
+    """Rebuild the running state from (day, weight) pairs."""
+    _reset(stats)
+    for day, weight in sorted(rows):
+        update_stats(stats, day, weight)
+    return stats
+
+
+def _stats_row(db, user_id):
+    stats = db.query(ProgressStats).filter_by(user_id=user_id).first()
+    if not stats:
+        stats = ProgressStats(user_id=user_id)
+        _reset(stats)
+        db.add(stats)
+    return stats
+
+
+def _history(db, user_id):
+    return db.query(Progress.day, Progress.weight_kg).filter_by(user_id=user_id).all()
+
+
+def record_progress(db, user_id, day, weight, edited):
+    """
+    Keep the stats in step with a saved check-in. Call after the Progress
+    row is written but before commit. `edited` is True when an existing
+    day was overwritten.
+    """
+    stats = db.query(ProgressStats).filter_by(user_id=user_id).first()
+    if stats and stats.entries and not edited and day > stats.last_day:
+        return update_stats(stats, day, weight)
+
+    # past day, overwrite or first use: rebuild from the stored history
+    db.flush()
+    return recompute_stats(_stats_row(db, user_id), _history(db, user_id))
+
+
+def clear_progress_stats(db, user_id):
+    db.query(ProgressStats).filter_by(user_id=user_id).delete()
+
+
+def get_progress_stats(db, user_id):
+    """Stats for the user, building them once for users with older history."""
+    stats = db.query(ProgressStats).filter_by(user_id=user_id).first()
+    if stats is None:
+        rows = _history(db, user_id)
+        if not rows:
+            return None
+        stats = recompute_stats(_stats_row(db, user_id), rows)
+        db.commit()
+    return stats
+
+
+def _target_weight(goal, height_cm):
+    # healthy-BMI goal weight: top of the normal band when cutting,
+    # middle of it when gaining
+    h_m = (height_cm or 0) / 100.0
+    if h_m <= 0:
+        return None
+    if goal == "lose":
+        return round(24.9 * h_m * h_m, 1)
+    if goal == "gain":
+        return round(22.0 * h_m * h_m, 1)
+    return None
+
+
+def progress_summary(stats, profile=None, plan=None):
+    """
+    Read-only view of the trend for templates and the coach: smoothed
+    weight, weekly rate, plan-implied rate, goal ETA and plateau flag.
+    """
+    if not stats or not stats.entries:
+        return None
+
+    goal = (profile.goal if profile else "").lower()
+    summary = {
+        "entries": stats.entries,
+        "trend_weight": round(stats.ema_weight, 1),
+        "weekly_rate": round(stats.weekly_rate, 2),
+        "total_change": round(stats.last_weight - stats.first_weight, 1),
+        "planned_rate": None,
+        "target_weight": None,
+        "eta_weeks": None,
+        "plateau": False,
+    }
+
+    if plan and profile:
+        daily_delta = plan.calories_target - maintenance_calories(plan.bmr, profile.activity_level)
+        summary["planned_rate"] = round(daily_delta * 7 / KCAL_PER_KG, 2)
+
+    target = _target_weight(goal, profile.height_cm if profile else None)
+    if target is not None:
+        summary["target_weight"] = target
+        remaining = target - stats.ema_weight
+        # use the observed rate when it points the right way, else the plan's
+        rate = stats.weekly_rate
+        if not rate or rate * remaining <= 0:
+            rate = summary["planned_rate"]
+        if remaining * (1 if goal == "gain" else -1) <= 0:
+            summary["eta_weeks"] = 0
+        elif rate and rate * remaining > 0:
+            summary["eta_weeks"] = int(round(remaining / rate))
+
+    if goal in ("lose", "gain") and stats.plateau_since_day is not None:
+        summary["plateau"] = stats.last_day - stats.plateau_since_day >= PLATEAU_DAYS
+
+    return summary
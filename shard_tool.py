@@ -0,0 +1,142 @@
+# shard_tool.py
+"""
+Move per-user rows when the shard count changes.
+
+    flask rebalance-shards --from 0 --to 4   # split fitness_ai.db into 4 shards
+    flask rebalance-shards --from 4 --to 8   # grow from 4 to 8 shards
+    flask rebalance-shards --from 4 --to 0   # fold everything back into one file
+
+Rows are moved in id order (so "latest plan" ordering survives). Each
+batch is inserted on the target and deleted from the source in one
+SQLite transaction spanning both files (the target is ATTACHed), so an
+interrupted run leaves every row in exactly one place and can simply be
+run again. Analytics counters have no owner, so each file's
+(metric, bucket) rows are added into the first new file the same way;
+admin reads sum the shards, so the totals don't change. Run it with the
+app stopped and the .db files backed up, then restart with FITAI_SHARDS
+set to the new count.
+"""
+
+from itertools import count
+
+from sqlalchemy import delete, select
+
+from database import SHARD_URL_TEMPLATE, SHARDED_TABLES, SQLALCHEMY_DATABASE_URL, make_engine, shard_for
+from models import AnalyticsCounter, Base
+
+BATCH_ROWS = 1000
+
+
+def _urls(shard_count):
+    if shard_count == 0:
+        return [SQLALCHEMY_DATABASE_URL]
+    return [SHARD_URL_TEMPLATE.format(i) for i in range(shard_count)]
+
+
+def _target(user_id, new_count):
+    return 0 if new_count == 0 else shard_for(user_id, new_count)
+
+
+# SQLite allows 10 attached files by default
+MAX_ATTACHED = 8
+
+_aliases = (f"move_target_{n}" for n in count())
+
+
+def _attach(conn, attached, engine):
+    """Schema alias for `engine`'s file on `conn`; attaches it (outside a transaction) if needed."""
+    alias = attached.get(engine)
+    if alias is None:
+        if len(attached) >= MAX_ATTACHED:
+            oldest = next(iter(attached))
+            conn.exec_driver_sql(f"DETACH DATABASE {attached.pop(oldest)}")
+        alias = next(_aliases)
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (engine.url.database,))
+        attached[engine] = alias
+    return alias
+
+
+def _merge_counters(engines, target):
+    """Add every counter row on `engines` into `target`; returns rows taken from other files."""
+    table = AnalyticsCounter.__table__.name
+    moved = 0
+    with target.connect() as conn:
+        attached = {}
+        for eng in engines:
+            if eng is target:
+                continue  # the target keeps its own rows (e.g. from an interrupted run)
+            alias = _attach(conn, attached, eng)
+            moved += conn.exec_driver_sql(f"SELECT count(*) FROM {alias}.{table}").scalar()
+            # one transaction per file: its counters are added and cleared together;
+            # the reconcile timestamp keeps the oldest
+            conn.exec_driver_sql(
+                f"INSERT INTO main.{table} (metric, bucket, value) "
+                f"SELECT metric, bucket, value FROM {alias}.{table} WHERE true "
+                "ON CONFLICT (metric, bucket) DO UPDATE SET value = CASE "
+                "WHEN excluded.metric = 'meta' THEN min(value, excluded.value) "
+                "ELSE value + excluded.value END"
+            )
+            conn.exec_driver_sql(f"DELETE FROM {alias}.{table}")
+            conn.commit()
+    return moved
+
+
+def rebalance(old_count, new_count, batch_rows=BATCH_ROWS):
+    """Move rows of the sharded tables to their home under `new_count`; returns rows moved."""
+    tables = [t for t in Base.metadata.sorted_tables if t.name in SHARDED_TABLES]
+    user_tables = [t for t in tables if "user_id" in t.c]
+    engines = {}
+
+    def engine_for(url):
+        if url not in engines:
+            engines[url] = make_engine(url)
+            Base.metadata.create_all(bind=engines[url], tables=tables)
+        return engines[url]
+
+    targets = [engine_for(url) for url in _urls(new_count)]
+    moved = 0
+
+    sources = [engine_for(url) for url in _urls(old_count)]
+    for source in sources:
+        with source.connect() as conn:
+            attached = {}
+            for table in user_tables:
+                columns = ", ".join(c.name for c in table.columns if c.name != "id")
+                last_id = 0
+                while True:
+                    rows = conn.execute(
+                        select(table.c.id, table.c.user_id)
+                        .where(table.c.id > last_id)
+                        .order_by(table.c.id)
+                        .limit(batch_rows)
+                    ).all()
+                    conn.commit()
+                    if not rows:
+                        break
+                    last_id = rows[-1].id
+
+                    outgoing = {}
+                    for row in rows:
+                        target = targets[_target(row.user_id, new_count)]
+                        if target is not source:
+                            outgoing.setdefault(target, []).append(row.id)
+
+                    # ids are re-assigned on the target: shards number rows independently
+                    for target, ids in outgoing.items():
+                        alias = _attach(conn, attached, target)
+                        marks = ", ".join("?" * len(ids))
+                        conn.exec_driver_sql(
+                            f"INSERT INTO {alias}.{table.name} ({columns}) "
+                            f"SELECT {columns} FROM main.{table.name} WHERE id IN ({marks}) ORDER BY id",
+                            tuple(ids),
+                        )
+                        conn.execute(delete(table).where(table.c.id.in_(ids)))
+                        conn.commit()  # copy and delete land together
+                        moved += len(ids)
+
+    # the first target may hold counters from an earlier, interrupted run
+    moved += _merge_counters(list(dict.fromkeys(sources + targets[:1])), targets[0])
+
+    for eng in engines.values():
+        eng.dispose()
+    return moved
@@ -0,0 +1,289 @@
+// static/js/offline.js
+
+(function () {
+  const QUEUE_PREFIX = "fitai-progress-queue:";
+  const MAX_BATCH = 400; // server cap per /add-progress request
+  const MAX_DAY = 3660; // same limits as the server
+  const MAX_WEIGHT_KG = 500;
+  const SEND_TIMEOUT_MS = 15000;
+  const NOTICE_KEY = "fitai-notice";
+  let userId = document.body.dataset.userId || null;
+  let inFlight = null;
+
+  // ---- Service worker ----
+  if ("serviceWorker" in navigator) {
+    window.addEventListener("load", function () {
+      navigator.serviceWorker.register("/sw.js").catch(function (err) {
+        console.error(err);
+      });
+    });
+  }
+
+  // ---- Offline progress queue (per user, in localStorage) ----
+  function queueKey() {
+    return userId ? QUEUE_PREFIX + userId : null;
+  }
+
+  function readQueue() {
+    const key = queueKey();
+    if (!key) return [];
+    try {
+      return JSON.parse(localStorage.getItem(key)) || [];
+    } catch (err) {
+      return [];
+    }
+  }
+
+  function writeQueue(entries) {
+    const key = queueKey();
+    if (!key) return;
+    if (entries.length) {
+      localStorage.setItem(key, JSON.stringify(entries));
+    } else {
+      localStorage.removeItem(key);
+    }
+  }
+
+  function enqueue(day, weight) {
+    // one entry per day; the latest weight wins, like the server
+    const entries = readQueue().filter(function (e) { return e.day !== day; });
+    entries.push({ day: day, weight: weight });
+    writeQueue(entries);
+  }
+
+  function validEntry(day, weight) {
+    return Number.isInteger(day) && day >= 1 && day <= MAX_DAY &&
+      Number.isFinite(weight) && weight > 0 && weight <= MAX_WEIGHT_KG;
+  }
+
+  function showNotice(text, category) {
+    const container = document.querySelector(".app-main .container");
+    if (!container) return;
+    const alert = document.createElement("div");
+    alert.className = "alert alert-" + category + " shadow-sm border-0";
+    alert.setAttribute("role", "status");
+    alert.textContent = text;
+    container.insertBefore(alert, container.firstChild);
+    setTimeout(function () { alert.remove(); }, 5000);
+  }
+
+  // { state: "synced" | "queued" (kept for later) | "empty", saved: n, rejected: n }
+  async function sendQueued(done) {
+    done = done || { saved: 0, rejected: 0 };
+    function result(state) {
+      return { state: state, saved: done.saved, rejected: done.rejected };
+    }
+
+    const sent = readQueue().slice(0, MAX_BATCH);
+    if (!sent.length) return result(done.saved || done.rejected ? "synced" : "empty");
+    if (!navigator.onLine) return result("queued");
+
+    // a stalled request on a weak connection counts as offline
+    const controller = new AbortController();
+    const timer = setTimeout(function () { controller.abort(); }, SEND_TIMEOUT_MS);
+    let res, body;
+    try {
+      res = await fetch("/add-progress", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ entries: sent }),
+        signal: controller.signal
+      });
+      body = res.ok ? await res.json() : null;
+    } catch (err) {
+      console.error(err); // offline or timed out – keep the queue for next time
+      return result("queued");
+    } finally {
+      clearTimeout(timer);
+    }
+
+    if (!res.ok) {
+      return result("queued"); // signed out or server trouble: retry later
+    }
+
+    // everything sent is done with: saved, or listed as rejected (bad data
+    // that will never succeed); keep anything queued while the request was
+    // in flight
+    const dropped = body.rejected || [];
+    if (dropped.length) {
+      console.error("Dropped invalid check-ins", dropped.map(function (i) { return sent[i]; }));
+    }
+    const left = readQueue().filter(function (e) {
+      return !sent.some(function (s) { return s.day === e.day && s.weight === e.weight; });
+    });
+    writeQueue(left);
+    return sendQueued({ saved: done.saved + body.saved, rejected: done.rejected + dropped.length });
+  }
+
+  function flushQueue() {
+    if (inFlight) {
+      // one request at a time; re-check the queue once it finishes
+      return inFlight.then(function () { return flushQueue(); });
+    }
+    inFlight = sendQueued().finally(function () {
+      inFlight = null;
+      renderProgress();
+    });
+    return inFlight;
+  }
+
+  function rejectedText(n) {
+    return n === 1
+      ? "One check-in was rejected – please check the day and weight."
+      : n + " check-ins were rejected – please check the day and weight.";
+  }
+
+  function afterSync(message, result) {
+    const notices = [];
+    if (result.saved) notices.push({ text: message, category: "success" });
+    if (result.rejected) notices.push({ text: rejectedText(result.rejected), category: "warning" });
+
+    const path = window.location.pathname;
+    if (path === "/dashboard" || document.getElementById("offlineShell")) {
+      // show the saved check-ins; the notices survive the page load
+      sessionStorage.setItem(NOTICE_KEY, JSON.stringify(notices));
+      window.location.href = "/dashboard";
+    } else {
+      notices.forEach(function (n) { showNotice(n.text, n.category); });
+    }
+  }
+
+  function flushInBackground() {
+    flushQueue().then(function (result) {
+      if (result.state === "synced") afterSync("Synced your offline check-ins.", result);
+    });
+  }
+
+  // ---- Offline shell (/offline): render cached plan + progress JSON ----
+  let savedEntries = [];
+
+  function cell(tag, text) {
+    const el = document.createElement(tag);
+    el.textContent = text;
+    return el;
+  }
+
+  function renderProgress() {
+    const body = document.getElementById("offlineProgress");
+    if (!body) return;
+
+    const byDay = {};
+    savedEntries.forEach(function (e) { byDay[e.day] = { weight: e.weight, pending: false }; });
+    readQueue().forEach(function (e) { byDay[e.day] = { weight: e.weight, pending: true }; });
+
+    body.innerHTML = "";
+    Object.keys(byDay)
+      .map(Number)
+      .sort(function (a, b) { return a - b; })
+      .forEach(function (day) {
+        const row = document.createElement("tr");
+        row.appendChild(cell("th", day));
+        const entry = byDay[day];
+        row.appendChild(cell("td", entry.weight + (entry.pending ? " (not synced)" : "")));
+        body.appendChild(row);
+      });
+  }
+
+  function renderPlan(plan) {
+    const box = document.getElementById("offlinePlan");
+    if (!box || !plan) return;
+    box.innerHTML = "";
+
+    box.appendChild(cell("p", "Daily target: " + plan.calories_target + " kcal · BMI " + plan.bmi));
+
+    const diet = plan.diet || {};
+    const meals = document.createElement("ul");
+    ["breakfast", "lunch", "dinner", "snacks"].forEach(function (meal) {
+      if (diet[meal]) {
+        meals.appendChild(cell("li", meal.charAt(0).toUpperCase() + meal.slice(1) + ": " + diet[meal]));
+      }
+    });
+    box.appendChild(meals);
+
+    const workout = plan.workout || {};
+    const title = plan.week ? "Week " + plan.week + " – " + plan.week_note : (workout.level || "Workouts");
+    box.appendChild(cell("h6", title));
+    const days = document.createElement("ol");
+    (workout.workouts || []).forEach(function (w) {
+      days.appendChild(cell("li", w));
+    });
+    box.appendChild(days);
+  }
+
+  async function loadJson(url) {
+    try {
+      const res = await fetch(url);
+      return res.ok ? await res.json() : null;
+    } catch (err) {
+      return null; // offline and nothing cached yet
+    }
+  }
+
+  async function renderOfflineShell() {
+    const [planData, progressData] = await Promise.all([
+      loadJson("/api/plan"),
+      loadJson("/api/progress")
+    ]);
+
+    // the shell may have been cached for whoever was signed in at the time;
+    // the data cache is cleared on login/logout, so trust the JSON
+    const data = progressData || planData;
+    if (data) userId = String(data.user_id);
+
+    if (progressData) savedEntries = progressData.entries || [];
+    if (planData) renderPlan(planData.plan);
+    renderProgress();
+  }
+
+  // ---- Init ----
+  document.addEventListener("DOMContentLoaded", function () {
+    const shell = document.getElementById("offlineShell");
+
+    const notices = sessionStorage.getItem(NOTICE_KEY);
+    if (notices) {
+      sessionStorage.removeItem(NOTICE_KEY);
+      try {
+        JSON.parse(notices).forEach(function (n) { showNotice(n.text, n.category); });
+      } catch (err) {
+        console.error(err);
+      }
+    }
+
+    // every check-in goes through the queue: sent right away, kept on
+    // this device if the network call fails
+    document.querySelectorAll(".js-progress-form").forEach(function (form) {
+      form.addEventListener("submit", async function (e) {
+        if (!userId) return; // unknown user: plain form post
+        e.preventDefault();
+
+        const day = Number(form.elements.day.value);
+        const weight = Number(form.elements.weight.value);
+        if (!validEntry(day, weight)) {
+          // never queue what the server would throw away
+          showNotice("Please enter a day of 1–" + MAX_DAY + " and a weight of up to " +
+            MAX_WEIGHT_KG + " kg.", "warning");
+          return;
+        }
+
+        enqueue(day, weight);
+        form.reset();
+        renderProgress();
+
+        const result = await flushQueue();
+        if (result.state === "synced") {
+          afterSync("Progress updated.", result);
+        } else {
+          showNotice("Saved on this device – it will sync when your connection is back.", "info");
+        }
+      });
+    });
+
+    if (shell) {
+      renderOfflineShell().then(flushInBackground);
+    } else {
+      flushInBackground();
+    }
+  });
+
+  window.addEventListener("online", flushInBackground);
+})();
@@ -0,0 +1,140 @@
+// static/js/sw.js  (served as /sw.js so its scope is the whole app)
+//
+// - static shell (our CSS/JS + CDN assets): stale-while-revalidate
+// - /api/plan and /api/progress: stale-while-revalidate, refreshed in the
+//   background after visits to /plans and /dashboard
+// - pages: always from the network; when that fails, the cached /offline
+//   shell renders the plan and progress from the cached JSON
+
+const VERSION = "v1";
+const SHELL_CACHE = "fitai-shell-" + VERSION;
+const DATA_CACHE = "fitai-data-" + VERSION;
+
+const OFFLINE_URL = "/offline";
+
+const SHELL_URLS = [
+  OFFLINE_URL,
+  "/static/css/style.css",
+  "/static/css/tables.css",
+  "/static/js/trainer.js",
+  "/static/js/offline.js",
+  "/static/manifest.webmanifest",
+  "/static/icons/icon.svg",
+];
+
+const CDN_URLS = [
+  "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css",
+  "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js",
+];
+
+const CDN_HOSTS = ["cdn.jsdelivr.net", "fonts.googleapis.com", "fonts.gstatic.com"];
+
+const DATA_URLS = ["/api/plan", "/api/progress"];
+
+// page visit -> JSON worth refreshing afterwards
+const REFRESH_AFTER = {
+  "/plans": ["/api/plan"],
+  "/dashboard": ["/api/progress"],
+};
+
+self.addEventListener("install", function (event) {
+  event.waitUntil(
+    caches.open(SHELL_CACHE).then(function (cache) {
+      const cdn = CDN_URLS.map(function (url) {
+        return new Request(url, { mode: "cors", credentials: "omit" });
+      });
+      return cache.addAll(SHELL_URLS.concat(cdn));
+    }).then(function () {
+      return self.skipWaiting();
+    })
+  );
+});
+
+self.addEventListener("activate", function (event) {
+  const keep = [SHELL_CACHE, DATA_CACHE];
+  event.waitUntil(
+    caches.keys().then(function (names) {
+      return Promise.all(
+        names
+          .filter(function (name) { return name.startsWith("fitai-") && keep.indexOf(name) === -1; })
+          .map(function (name) { return caches.delete(name); })
+      );
+    }).then(function () {
+      return Promise.all([self.clients.claim(), refreshData(DATA_URLS)]);
+    })
+  );
+});
+
+function staleWhileRevalidate(event, cacheName) {
+  const request = event.request;
+  const refresh = caches.open(cacheName).then(function (cache) {
+    return fetch(request).then(function (response) {
+      if (response.ok || response.type === "opaque") {
+        cache.put(request, response.clone());
+      }
+      return response;
+    });
+  });
+
+  return caches.match(request).then(function (cached) {
+    if (cached) {
+      event.waitUntil(refresh.catch(function () {}));
+      return cached;
+    }
+    return refresh;
+  });
+}
+
+function refreshData(urls) {
+  return caches.open(DATA_CACHE).then(function (cache) {
+    return Promise.all(urls.map(function (url) {
+      return fetch(url, { credentials: "same-origin" }).then(function (response) {
+        if (response.ok) return cache.put(url, response);
+      }).catch(function () {});
+    }));
+  });
+}
+
+self.addEventListener("fetch", function (event) {
+  const request = event.request;
+  if (request.method !== "GET") return;
+
+  const url = new URL(request.url);
+
+  if (url.origin !== self.location.origin) {
+    if (CDN_HOSTS.indexOf(url.hostname) !== -1) {
+      event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+    }
+    return;
+  }
+
+  if (DATA_URLS.indexOf(url.pathname) !== -1) {
+    event.respondWith(staleWhileRevalidate(event, DATA_CACHE));
+    return;
+  }
+
+  if (request.mode === "navigate") {
+    // someone else may sign in next: forget the previous user's data
+    if (url.pathname === "/logout" || url.pathname === "/login") {
+      event.waitUntil(caches.delete(DATA_CACHE));
+      return;
+    }
+
+    event.respondWith(
+      fetch(request).then(function (response) {
+        const stale = REFRESH_AFTER[url.pathname];
+        if (stale && response.ok && !response.redirected) {
+          event.waitUntil(refreshData(stale));
+        }
+        return response;
+      }).catch(function () {
+        return caches.match(OFFLINE_URL);
+      })
+    );
+    return;
+  }
+
+  if (url.pathname.startsWith("/static/") || SHELL_URLS.indexOf(url.pathname) !== -1) {
+    event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+  }
+});
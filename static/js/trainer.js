@@ -13,10 +13,7 @@
     return escapeHtml(text).replace(/\n/g, "<br>");
   }
 
-  function appendMessage(role, text) {
-    const chat = document.getElementById("trainerChat");
-    if (!chat) return;
-
+  function buildMessage(role, text) {
     const msg = document.createElement("div");
     msg.className = "trainer-msg " + (role === "user" ? "trainer-msg-user" : "trainer-msg-bot");
 
@@ -30,10 +27,55 @@
 
     msg.appendChild(avatar);
     msg.appendChild(bubble);
-    chat.appendChild(msg);
+    return msg;
+  }
+
+  function appendMessage(role, text) {
+    const chat = document.getElementById("trainerChat");
+    if (!chat) return;
+
+    chat.appendChild(buildMessage(role, text));
     chat.scrollTop = chat.scrollHeight;
   }
 
+  // ---- Saved history (newest page first, older pages on demand) ----
+  let nextBefore = null;
+
+  async function loadHistory(before) {
+    const chat = document.getElementById("trainerChat");
+    const history = document.getElementById("trainerHistory");
+    const olderBtn = document.getElementById("trainerLoadOlder");
+    if (!chat || !history) return;
+
+    let url = "/trainer/history";
+    if (before) url += "?before=" + encodeURIComponent(before);
+
+    try {
+      const res = await fetch(url);
+      if (!res.ok) {
+        throw new Error("Server error " + res.status);
+      }
+      const data = await res.json();
+
+      const page = document.createDocumentFragment();
+      (data.messages || []).forEach(function (m) {
+        page.appendChild(buildMessage(m.role, m.text));
+      });
+
+      // keep the view steady when older messages are added above it
+      const fromBottom = chat.scrollHeight - chat.scrollTop;
+      history.insertBefore(page, history.firstChild);
+      chat.scrollTop = before ? chat.scrollHeight - fromBottom : chat.scrollHeight;
+
+      nextBefore = data.next_before;
+      if (olderBtn) olderBtn.hidden = !nextBefore;
+    } catch (err) {
+      console.error(err);
+      // let the user retry the page that failed
+      if (olderBtn) olderBtn.hidden = !nextBefore;
+    }
+  }
+
   function setLoading(isLoading) {
     const input = document.getElementById("trainerInput");
     const btn = document.getElementById("trainerSendBtn");
@@ -159,6 +201,15 @@
         }
       });
 
+      const olderBtn = document.getElementById("trainerLoadOlder");
+      if (olderBtn) {
+        olderBtn.addEventListener("click", function () {
+          if (!nextBefore) return;
+          olderBtn.hidden = true; // one page at a time
+          loadHistory(nextBefore);
+        });
+      }
+
       chips.forEach(function (chip) {
         chip.addEventListener("click", function () {
           const msg = chip.getAttribute("data-message") || chip.textContent;
@@ -167,6 +218,7 @@
       });
 
       setupVoice();
+      loadHistory(null);
     }
   });
 })();